@@ -1,16 +1,50 @@
+import copy
 import os, sys
 import multiprocessing
+import queue
+from collections import deque
 from multiprocessing.queues import SimpleQueue
 from typing import Any
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 import time
+import numpy as np
 from src.Maze import Maze
 from src.PathSpecification import PathSpecification
-from src.Ant import Ant
+from src.Ant import Ant, ALPHA, EUCLID, BFS, ITERATIONS, heuristic_beta
+from src.GraphAnt import GraphAnt
+from src.Route import Route, SHORTCUT_RADIUS
+from src.GenerationStatistics import GenerationStatistics
 
 THREADING = True
+# relative threshold of the lambda-branching factor
+LAMBDA = 0.05
+# seconds between checks of the deadline while waiting for ants
+POLL_INTERVAL = 0.01
+# initial step budget of an ant, per accessible tile and per step of the lower bound distance to the goal
+CELL_STEPS = 4
+DISTANCE_STEPS = 20
+# step budget relative to the most steps a successful ant of the last generation needed
+SUCCESS_STEPS = 2
+# exchanges between the colonies of the island mode
+MIGRATE_ROUTES = "routes"
+BLEND_PHEROMONES = "blend"
+# weight of the pheromones of the neighbouring colony when blending
+ISLAND_WEIGHT = 0.25
+# pheromone deposit strategies
+ANT_SYSTEM = "ant system"
+ELITIST = "elitist"
+RANK_BASED = "rank"
+MAX_MIN = "max-min"
+# amount of ranks of the rank based deposit, the best route so far and the best RANKS - 1 routes of a generation
+RANKS = 6
+# MAX-MIN: the lower bound is the upper bound / (MIN_SPREAD * best route length)
+MIN_SPREAD = 2
+# MAX-MIN: generations without a shorter route before the pheromones are reset to the upper bound
+RESTART = 10
+# least amount of ants per target and generation of the one-to-many search
+TARGET_ANTS = 4
 
 
 # Class representing the first assignment. Finds shortest path between two points in a maze according to a specific
@@ -23,76 +57,925 @@ class AntColonyOptimization:
     # @param generations the amount of generations.
     # @param Q normalization factor for the amount of dropped pheromone
     # @param evaporation the evaporation factor.
-    def __init__(self, maze, ants_per_gen, generations, q, evaporation):
+    # @param stagnation stop after this many generations without a shorter route (None disables).
+    # @param branching stop when the average lambda-branching factor over the junctions of the maze drops to this
+    # value (None disables), see Maze.get_branching_factor. It is measured on the pheromones of a generation before
+    # its deposit.
+    # @param target_length stop as soon as a route of at most this length is found, e.g. known from BFS (None disables).
+    # @param pheromone_cache PheromoneCache used to warm start solves towards the same or nearby targets (None disables).
+    # @param heuristic heuristic of the ants, EUCLID or BFS (distance field of the target, cached on the maze).
+    # @param prune_dead_ends solve in a copy of the maze with its dead ends filled in.
+    # @param contract_corridors let the ants walk the junction graph of the maze, with pheromone per corridor.
+    # @param share_dead_ends let ants publish the dead ends they find to a map shared by the colony. Only ants walking
+    # tiles use it, with contract_corridors no map is made as a dead end is a single step on the junction graph.
+    # @param abort_slack abort ants whose route plus a lower bound to the goal exceeds the best length times this
+    # (None disables).
+    # @param adaptive_budget derive the step budget of the ants per solve instead of always using ITERATIONS.
+    # @param seed seed of the ants (None seeds from the OS). A solve with the same seed gives the same routes for any
+    # amount of workers, unless the ants share dead ends or a deadline interrupts a generation.
+    # @param workers maximum amount of ants running at the same time in worker processes (None runs all ants of a
+    # generation at once).
+    # @param steady_state start a new ant as soon as one finishes and update the pheromones for every finished ant,
+    # instead of waiting for the whole generation. A generation is then reported every ants_per_gen finished ants.
+    # @param deposit pheromone deposit after a generation. ANT_SYSTEM: every finished ant deposits q / length.
+    # ELITIST: the best route so far deposits elitist_weight times on top. RANK_BASED: the best route so far deposits
+    # RANKS times and the best RANKS - 1 ants of the generation RANKS - 1 down to 1 times. MAX_MIN: only the best ant
+    # of the generation deposits, the pheromones are kept within bounds set by the best route so far, start at the
+    # upper bound once the first route is found and are reset to it after RESTART generations without a shorter route. Steady state solves always use ANT_SYSTEM.
+    # @param elitist_weight weight of the best route so far with ELITIST, defaults to the amount of ants per generation
+    # @param shortcut_radius replace detours of the best route of every generation by shortest paths of at most this
+    # length, see Route.shortcut. Not applied to routes on the junction graph (None disables).
+    # @param union_generations after every generation also search the shortest route exactly, restricted to the tiles
+    # of the routes finished in this many last generations, at least 1. Not applied on the junction graph (None
+    # disables).
+    # @param direction_pheromones keep pheromone per outgoing direction of every tile instead of per tile, so an ant
+    # passing a tile in one direction does not attract ants going the other way. Ignored on the junction graph.
+    def __init__(self, maze, ants_per_gen, generations, q, evaporation, stagnation=None, branching=None,
+                 target_length=None, pheromone_cache=None, heuristic=EUCLID, prune_dead_ends=False,
+                 contract_corridors=False, share_dead_ends=False, abort_slack=None, adaptive_budget=True,
+                 seed=None, workers=None, steady_state=False, deposit=ANT_SYSTEM, elitist_weight=None,
+                 shortcut_radius=SHORTCUT_RADIUS, union_generations=None, direction_pheromones=False):
         self.maze = maze
         self.ants_per_gen = ants_per_gen
         self.generations = generations
         self.q = q
         self.evaporation = evaporation
+        self.stagnation = stagnation
+        self.branching = branching
+        self.target_length = target_length
+        self.pheromone_cache = pheromone_cache
+        self.heuristic = heuristic
+        self.prune_dead_ends = prune_dead_ends
+        self.contract_corridors = contract_corridors
+        self.share_dead_ends = share_dead_ends
+        self.abort_slack = abort_slack
+        self.max_length = None
+        self.adaptive_budget = adaptive_budget
+        self.workers = workers
+        self.steady_state = steady_state
+        self.deposit = deposit
+        self.elitist_weight = ants_per_gen if elitist_weight is None else elitist_weight
+        self.shortcut_radius = shortcut_radius
+        if union_generations is not None and union_generations < 1:
+            raise ValueError("union_generations must be at least 1, use None to disable it")
+        self.union_generations = union_generations
+        self.direction_pheromones = direction_pheromones
+        # worker processes of a steady state solve, they outlive a generation
+        self.steady_threads = []
+        self.steady_queue = None
+        self.launched = 0
+        self.arrived = 0
+        # whether the previous colony of an island ring said it sent its last message
+        self.inbox_closed = False
+        self.set_seed(seed)
+        self.step_budget = ITERATIONS
+        self.min_step_budget = 0
+        self.graph = None
+        self.dead_ends = None
+        self.meet = None
         self.routes = []
+        self.stop_reason = None
+        self.generations_run = 0
+        self.ants_run = 0
+        self.ants_aborted = 0
+        self.ants_exhausted = 0
 
     # Loop that starts the shortest path process
     # @param spec Spefication of the route we wish to optimize
+    # @param deadline absolute time (time.time()) at which the best route so far is returned
+    # @param time_budget amount of seconds after which the best route so far is returned
+    # @return ACO optimized route, an unfinished route from the start when no ant reached the end
+    def find_shortest_route(self, path_specification, q=None, deadline=None, time_budget=None):
+        best_route = None
+        for stats in self.iter_generations(path_specification, deadline, time_budget):
+            print(stats)
+            best_route = stats.get_best_route()
+        if best_route is None:
+            # the deadline passed before the first generation finished
+            best_route = Route(path_specification.get_start())
+            best_route.end = path_specification.get_end()
+
+        if self.stop_reason != "generations":
+            print("stopped after " + str(self.generations_run) + " generations, " + str(self.ants_run) + " ants ("
+                  + str(self.ants_aborted) + " aborted, " + str(self.ants_exhausted) + " ran out): " + self.stop_reason)
+        if q is not None:
+            q.put(best_route)
+        else:
+            return best_route
+
+    # One-to-many search: a single colony starting at one point finds routes to all given targets in one run.
+    # Every target has its own pheromone channel and every generation runs ants_per_gen ants spread over the targets,
+    # but at least TARGET_ANTS per target. As routes contain no loops, every route that passes another target also
+    # yields a route to that target, so the exploration of each ant is shared by all targets it reaches.
+    # The options of the colony apply per target: the pheromone cache, deposit, shortcut_radius, abort_slack and
+    # share_dead_ends (with a map per target, a dead end towards one target may hold another). prune_dead_ends keeps
+    # the start and all targets open and stagnation stops once all targets are reached and none improved for that many
+    # generations. target_length, branching, union_generations, steady_state and contract_corridors do not apply.
+    # @param start the start coordinate
+    # @param ends list of target coordinates
+    # @return list of the best routes, in the order of ends, None for the targets no ant reached
+    # @throws ValueError when the colony uses an option that does not apply
+    def find_shortest_routes(self, start, ends):
+        unsupported = [name for name, used in (("target_length", self.target_length is not None),
+                                               ("branching", self.branching is not None),
+                                               ("union_generations", self.union_generations is not None),
+                                               ("steady_state", self.steady_state),
+                                               ("contract_corridors", self.contract_corridors)) if used]
+        if unsupported:
+            raise ValueError("find_shortest_routes does not support " + ", ".join(unsupported))
+        maze = self.maze
+        if self.prune_dead_ends and not maze.protects([start] + ends):
+            self.maze = maze.get_pruned([start] + ends)
+        try:
+            return self.run_targets(start, ends)
+        finally:
+            self.maze = maze
+            self.dead_ends = None
+
+    # Body of find_shortest_routes, runs the generations on the current maze.
+    # @param start the start coordinate
+    # @param ends list of target coordinates
+    # @return list of the best routes, in the order of ends, None for the targets no ant reached
+    def run_targets(self, start, ends):
+        self.maze.set_direction_pheromones(self.direction_pheromones)
+        best_routes = [None] * len(ends)
+        for k, end in enumerate(ends):
+            if end == start:
+                best_routes[k] = Route(start)
+                best_routes[k].done = True
+                best_routes[k].end = end
+        open_targets = [k for k in range(len(ends)) if ends[k] != start]
+        ants = max(min(self.ants_per_gen, TARGET_ANTS), -(-self.ants_per_gen // max(1, len(open_targets))))
+        channels = [None] * len(ends)
+        dead_ends = [None] * len(ends)
+        for k in open_targets:
+            self.maze.reset()
+            if self.pheromone_cache is not None:
+                warm = self.pheromone_cache.lookup(self.maze, ends[k])
+                if warm is not None:
+                    self.maze.set_pheromone_grid(warm)
+            channels[k] = self.maze.get_pheromone_state()
+            if self.share_dead_ends:
+                dead_ends[k] = self.create_dead_end_map()
+
+        self.stop_reason = None
+        self.generations_run = 0
+        self.ants_run = 0
+        self.ants_aborted = 0
+        self.ants_exhausted = 0
+        self.max_length = None
+        # the step budget has to cover the farthest target
+        step_budget = 0
+        min_step_budget = 0
+        for k in open_targets:
+            self.init_step_budget(PathSpecification(start, ends[k]))
+            step_budget = max(step_budget, self.step_budget)
+            min_step_budget = max(min_step_budget, self.min_step_budget)
+        self.step_budget = step_budget
+        self.min_step_budget = min_step_budget
+        stagnant = 0
+        since_restart = [0] * len(ends)
+        bounded = [False] * len(ends)
+        for gen in range(0, self.generations if open_targets else 0):
+            self.generations_run = gen + 1
+            routes = []
+            for k in open_targets:
+                self.maze.set_pheromone_state(channels[k])
+                self.dead_ends = dead_ends[k]
+                if self.abort_slack is not None and best_routes[k] is not None:
+                    self.max_length = best_routes[k].size() * self.abort_slack
+                else:
+                    self.max_length = None
+                found, _ = self.run_generation(PathSpecification(start, ends[k]), gen, ants=ants)
+                routes.extend(found)
+            self.ants_run += len(routes)
+            self.ants_aborted += sum(1 for r in routes if r.aborted)
+            self.ants_exhausted += sum(1 for r in routes if r.exhausted)
+            self.adapt_step_budget(routes)
+
+            completed = 0
+            improved = False
+            for k in open_targets:
+                prefixes = [p for p in (r.get_prefix(ends[k]) for r in routes) if p is not None]
+                completed += len(prefixes)
+                route = min(prefixes, key=lambda r: r.size()) if prefixes else None
+                if route is not None and self.shortcut_radius is not None:
+                    route = route.shortcut(self.maze, self.shortcut_radius)
+                if route is not None and (best_routes[k] is None or route.shorter_than(best_routes[k])):
+                    best_routes[k] = route
+                    improved = True
+                    since_restart[k] = 0
+                else:
+                    since_restart[k] += 1
+                self.maze.set_pheromone_state(channels[k])
+                if self.deposit == MAX_MIN and not bounded[k] and best_routes[k] is not None:
+                    self.reset_pheromones(self.get_pheromone_bounds(best_routes[k])[1])
+                    bounded[k] = True
+                self.update_pheromones(prefixes, best_route=best_routes[k])
+                if self.deposit == MAX_MIN and since_restart[k] >= RESTART and best_routes[k] is not None:
+                    self.reset_pheromones(self.get_pheromone_bounds(best_routes[k])[1])
+                    since_restart[k] = 0
+                channels[k] = self.maze.get_pheromone_state()
+            stagnant = 0 if improved else stagnant + 1
+            reached = sum(1 for r in best_routes if r is not None)
+            print("gen: " + str(gen) + ", routes to targets: " + str(completed) + ", reached: "
+                  + str(reached) + "/" + str(len(ends)))
+            if self.stagnation is not None and stagnant >= self.stagnation and reached == len(ends):
+                self.stop_reason = "stagnation"
+                break
+
+        if self.stop_reason is None:
+            self.stop_reason = "generations"
+        if self.pheromone_cache is not None and self.generations_run > 0:
+            for k in open_targets:
+                self.maze.set_pheromone_state(channels[k])
+                self.pheromone_cache.store(self.maze, ends[k])
+        self.maze.reset()
+        return best_routes
+
+    # Bidirectional search: one colony starts at the start and one at the end, each with its own pheromones.
+    # An ant finishes as soon as it steps on a tile reached by an ant of the other colony in the previous generation,
+    # its route is then joined with the route of that ant into a route from start to end. Both colonies deposit
+    # pheromone for the joined routes, the colony of the end on the reversed routes.
+    # The ants walk the tiles of the maze, contract_corridors and steady_state do not apply.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param deadline absolute time (time.time()) at which the best route so far is returned
+    # @param time_budget amount of seconds after which the best route so far is returned
     # @return ACO optimized route
-    def find_shortest_route(self, path_specification, q=None):
+    def find_shortest_route_bidirectional(self, path_specification, deadline=None, time_budget=None):
+        start = path_specification.get_start()
+        end = path_specification.get_end()
+        best_route = Route(start)
+        best_route.end = end
+        if start == end:
+            best_route.done = True
+            return best_route
+        if time_budget is not None:
+            budget_end = time.time() + time_budget
+            deadline = budget_end if deadline is None else min(deadline, budget_end)
+
+        maze = self.maze
+        if self.prune_dead_ends and not maze.protects([start, end]):
+            self.maze = maze.get_pruned([start, end])
+        self.maze.set_direction_pheromones(self.direction_pheromones)
         self.maze.reset()
-        # start_pt = path_specification.get_start(path_specification)
-        # end_pt = path_specification.get_end(path_specification)
-        route = None
-        for gen in range(0, self.generations):
-            self.routes = []
-            threads = []
-            if THREADING:
-                queue: SimpleQueue[Any] = multiprocessing.SimpleQueue()
-            for ant_i in range(0, self.ants_per_gen):
-                if THREADING:
-                    t = multiprocessing.Process(target=self.run, args=(path_specification, queue))
-                    t.start()
-                    threads.append(t)
-                else:
-                    self.run(path_specification)
-                    print("gen: " + str(gen) + ", ant: " + str(ant_i) + ", len " + str(len(self.routes[-0].get_route())))
+        if self.share_dead_ends:
+            self.dead_ends = self.create_dead_end_map()
+        specs = [path_specification, PathSpecification(end, start)]
+        grids = [self.maze.get_pheromone_state() for _ in specs]
+        previous = [[], []]
+        stagnant = 0
+        bounded = False
+        self.stop_reason = "generations"
+        self.generations_run = 0
+        self.ants_run = 0
+        self.max_length = None
+        self.init_step_budget(path_specification)
+        try:
+            for gen in range(0, self.generations):
+                if deadline is not None and time.time() >= deadline:
+                    self.stop_reason = "deadline"
+                    break
+                self.generations_run = gen + 1
+                found = [[], []]
+                joined = []
+                interrupted = False
+                for k in (0, 1):
+                    # the origin of the other colony is always a meeting point, as if reached by an empty route
+                    others = [Route(specs[1 - k].get_start())] + previous[1 - k]
+                    owner, offset = self.get_meeting_map(others)
+                    self.meet = owner >= 0
+                    self.meet[specs[k].get_start().get_x(), specs[k].get_start().get_y()] = False
+                    self.maze.set_pheromone_state(grids[k])
+                    found[k], stopped = self.run_generation(specs[k], gen, deadline)
+                    interrupted = interrupted or stopped
+                    for r in found[k]:
+                        if not r.done:
+                            continue
+                        x, y = r.get_cells()[-1]
+                        other = others[owner[x, y]]
+                        half = Route.from_directions(other.get_start(), other.get_route()[:offset[x, y]])
+                        joined.append(r.join(half) if k == 0 else half.join(r))
+                    self.ants_run += len(found[k])
+                previous = found
+                self.adapt_step_budget(found[0] + found[1])
 
-            if THREADING:
-                for t in threads:
-                    self.routes.append(queue.get())
-            # TSPData includes paths from C to C return early with 0 path
-            if path_specification.start == path_specification.end:
-                if THREADING:
-                    q.put(self.routes.pop())
-                    return
+                route = min(joined, key=lambda r: r.size()) if joined else None
+                if route is not None and self.shortcut_radius is not None:
+                    route = route.shortcut(self.maze, self.shortcut_radius)
+                if route is not None and (not best_route.done or route.shorter_than(best_route)):
+                    best_route = route
+                    stagnant = 0
                 else:
-                    return self.routes.pop()
-
-            self.maze.evaporate(self.evaporation)
-            self.maze.add_pheromone_routes(self.routes, self.q)
-            s = 100000
-            l = 0
-            a = 0
-            route = self.routes[0]
-            c = 0
+                    stagnant += 1
+                print("gen: " + str(gen) + ", joined: " + str(len(joined)) + "/" + str(len(found[0]) + len(found[1]))
+                      + ", shortest: " + (str(route.size()) if route is not None else "None")
+                      + ", best: " + (str(best_route.size()) if best_route.done else "None"))
+                if interrupted:
+                    self.stop_reason = "deadline"
+                    break
+
+                # both colonies have to converge, the branching factor of the least converged one counts
+                branching = None
+                for k in (0, 1):
+                    routes = joined if k == 0 else [Route(end).join(r) for r in joined]
+                    best = best_route if k == 0 or not best_route.done else Route(end).join(best_route)
+                    self.maze.set_pheromone_state(grids[k])
+                    if self.branching is not None:
+                        branching = max(branching or 0, self.maze.get_branching_factor(LAMBDA))
+                    if self.deposit == MAX_MIN and not bounded and best_route.done:
+                        self.reset_pheromones(self.get_pheromone_bounds(best)[1])
+                    self.update_pheromones(routes, best_route=best)
+                    grids[k] = self.maze.get_pheromone_state()
+                bounded = bounded or best_route.done
+                reason = self.check_convergence(best_route, stagnant, branching)
+                if reason is not None:
+                    self.stop_reason = reason
+                    break
+        finally:
+            self.maze = maze
+            self.meet = None
+            self.dead_ends = None
+        return best_route
+
+    # Tiles on the finished routes of a generation
+    # @param routes the routes of the generation
+    # @return width x length bool array
+    def get_walked_tiles(self, routes):
+        tiles = np.zeros((self.maze.get_width(), self.maze.get_length()), dtype=bool)
+        for r in routes:
+            if r.done:
+                cells = r.get_cells()
+                tiles[cells[:, 0], cells[:, 1]] = True
+        return tiles
+
+    # Tiles reached by the ants of a colony, with the shortest way back to its origin along their routes.
+    # @param routes routes of the colony, all starting at its origin
+    # @return width x length arrays with the index of the route reaching every tile (-1 when none)
+    # and the amount of steps from the origin to the tile on that route
+    def get_meeting_map(self, routes):
+        shape = (self.maze.get_width(), self.maze.get_length())
+        owner = np.full(shape, -1)
+        offset = np.full(shape, np.iinfo(np.int64).max)
+        for i, r in enumerate(routes):
+            # routes contain no loops, so every tile appears once per route
+            cells = r.get_cells()
+            steps = np.arange(len(cells))
+            closer = steps < offset[cells[:, 0], cells[:, 1]]
+            owner[cells[closer, 0], cells[closer, 1]] = i
+            offset[cells[closer, 0], cells[closer, 1]] = steps[closer]
+        return owner, offset
+
+    # Island mode: several colonies, each with its own pheromones, solve the same path specification in separate
+    # processes. They are connected in a ring and every interval generations a colony sends its best route and
+    # pheromones to the next one. With MIGRATE_ROUTES a colony deposits the best route it received on its own
+    # pheromones, with BLEND_PHEROMONES it mixes in the pheromones it received with weight ISLAND_WEIGHT.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param colonies amount of colonies
+    # @param interval amount of generations between exchanges
+    # @param exchange MIGRATE_ROUTES or BLEND_PHEROMONES
+    # @param deadline absolute time (time.time()) at which the best route so far is returned
+    # @param time_budget amount of seconds after which the best route so far is returned
+    # @return the best route of all colonies
+    def find_shortest_route_islands(self, path_specification, colonies=4, interval=5, exchange=MIGRATE_ROUTES,
+                                    deadline=None, time_budget=None):
+        if time_budget is not None:
+            budget_end = time.time() + time_budget
+            deadline = budget_end if deadline is None else min(deadline, budget_end)
+        islands = [self.create_island(k) for k in range(colonies)]
+        best_routes = [None] * colonies
+        if not THREADING:
+            # the colonies take turns, one generation at a time
+            inboxes = [queue.SimpleQueue() for _ in islands]
+            runs = [island.iter_island(path_specification, inboxes[k], inboxes[(k + 1) % colonies], interval,
+                                       exchange, deadline) for k, island in enumerate(islands)]
+            while any(run is not None for run in runs):
+                for k, run in enumerate(runs):
+                    stats = next(run, None) if run is not None else None
+                    if stats is None:
+                        runs[k] = None
+                        continue
+                    print("island " + str(k) + ", " + str(stats))
+                    best_routes[k] = stats.get_best_route()
+        else:
+            inboxes = [multiprocessing.Queue() for _ in islands]
+            results: SimpleQueue[Any] = multiprocessing.SimpleQueue()
+            threads = []
+            for k, island in enumerate(islands):
+                t = multiprocessing.Process(target=island.run_island,
+                                            args=(k, path_specification, inboxes[k], inboxes[(k + 1) % colonies],
+                                                  interval, exchange, deadline, results))
+                t.start()
+                threads.append(t)
+            for _ in threads:
+                k, route = results.get()
+                best_routes[k] = route
+            for t in threads:
+                t.join()
+
+        best_route = None
+        for k, route in enumerate(best_routes):
+            print("island " + str(k) + ": " + (str(route.size()) if route is not None and route.done else "no route"))
+            if route is not None and (best_route is None or self.is_better(route, best_route)):
+                best_route = route
+        return best_route
+
+    # Copy of this colony for the island mode, with its own pheromones and seed.
+    # @param k index of the island
+    # @return the colony
+    def create_island(self, k):
+        island = copy.deepcopy(self)
+        island.seed_sequence = np.random.SeedSequence(self.seed_sequence.entropy,
+                                                      spawn_key=self.seed_sequence.spawn_key + (k,))
+        return island
+
+    # Body of an island process, runs the colony and sends its best route to the results.
+    # @param k index of the island
+    # @param path_specification Specification of the route we wish to optimize
+    # @param inbox queue the previous colony of the ring sends to
+    # @param outbox queue of the next colony of the ring
+    # @param interval amount of generations between exchanges
+    # @param exchange MIGRATE_ROUTES or BLEND_PHEROMONES
+    # @param deadline absolute time (time.time()) at which the colony stops
+    # @param results queue receiving the index of the island and its best route
+    def run_island(self, k, path_specification, inbox, outbox, interval, exchange, deadline, results):
+        best_route = None
+        for stats in self.iter_island(path_specification, inbox, outbox, interval, exchange, deadline):
+            print("island " + str(k) + ", " + str(stats))
+            best_route = stats.get_best_route()
+        results.put((k, best_route))
+        # messages larger than the pipe buffer are still being written after put returns, a colony that exits then
+        # leaves a partial message the next colony blocks on. None tells the next colony this one is done, and
+        # reading on until the previous colony is done lets it finish writing.
+        outbox.put(None)
+        while not self.inbox_closed:
+            self.inbox_closed = inbox.get() is None
+
+    # iter_generations of an island, exchanging with the neighbouring colonies every interval generations.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param inbox queue the previous colony of the ring sends to
+    # @param outbox queue of the next colony of the ring
+    # @param interval amount of generations between exchanges
+    # @param exchange MIGRATE_ROUTES or BLEND_PHEROMONES
+    # @param deadline absolute time (time.time()) at which the generator stops
+    # @return generator of GenerationStatistics, one per generation
+    def iter_island(self, path_specification, inbox, outbox, interval, exchange, deadline=None):
+        for stats in self.iter_generations(path_specification, deadline):
+            yield stats
+            if (stats.get_generation() + 1) % interval == 0:
+                self.migrate(stats.get_best_route(), inbox, outbox, exchange)
+
+    # Send the best route and pheromones to the next colony and take in the latest message of the previous one.
+    # Colonies do not wait for each other, when nothing arrived yet the exchange is skipped.
+    # @param best_route the best route of this colony so far
+    # @param inbox queue the previous colony of the ring sends to
+    # @param outbox queue of the next colony of the ring
+    # @param exchange MIGRATE_ROUTES or BLEND_PHEROMONES
+    def migrate(self, best_route, inbox, outbox, exchange):
+        state = self.maze.get_pheromone_state() if exchange == BLEND_PHEROMONES else None
+        outbox.put((best_route, state))
+        message = None
+        while not self.inbox_closed:
+            try:
+                received = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if received is None:
+                self.inbox_closed = True
+            else:
+                message = received
+        if message is None:
+            return
+        route, state = message
+        if exchange == BLEND_PHEROMONES:
+            # the directions are blended as well, rebuilding them from the blended grid would lose which way
+            # the pheromone on a tile points
+            blend = [None if own is None or other is None else (1 - ISLAND_WEIGHT) * own + ISLAND_WEIGHT * other
+                     for own, other in zip(self.maze.get_pheromone_state(), state)]
+            if self.graph is not None:
+                self.graph.set_pheromones_from_grid(blend[0])
+                blend = [self.graph.get_pheromone_grid(), None]
+            self.maze.set_pheromone_state(tuple(blend))
+        elif route is not None and route.done and route.size() > 0:
+            self.update_pheromones([route], 0)
+
+    # Generator running the colony one generation at a time, so callers can stream progress, stop early or
+    # use intermediate routes. The stopping criteria and deadline are applied between generations. When the caller
+    # stops iterating early, stop_reason is "interrupted" and the counters cover the generations that were yielded.
+    # @param spec Spefication of the route we wish to optimize
+    # @param deadline absolute time (time.time()) at which the generator stops
+    # @param time_budget amount of seconds after which the generator stops
+    # @return generator of GenerationStatistics, one per generation
+    def iter_generations(self, path_specification, deadline=None, time_budget=None):
+        # the budget also covers the pruning, the cache lookup and the graph build below
+        if time_budget is not None:
+            budget_end = time.time() + time_budget
+            deadline = budget_end if deadline is None else min(deadline, budget_end)
+        maze = self.maze
+        ends = [path_specification.get_start(), path_specification.get_end()]
+        if self.prune_dead_ends and not maze.protects(ends):
+            self.maze = maze.get_pruned(ends)
+        self.maze.set_direction_pheromones(self.direction_pheromones)
+        self.maze.reset()
+        if self.pheromone_cache is not None:
+            warm = self.pheromone_cache.lookup(self.maze, path_specification.get_end())
+            if warm is not None:
+                self.maze.set_pheromone_grid(warm)
+        if self.contract_corridors:
+            self.graph = self.maze.get_junction_graph(ends)
+            self.graph.set_pheromones_from_grid(self.maze.get_pheromone_grid())
+        if self.share_dead_ends and self.graph is None:
+            self.dead_ends = self.create_dead_end_map()
+        try:
+            yield from self.run_generations(path_specification, deadline)
+        finally:
+            if self.pheromone_cache is not None and self.generations_run > 0:
+                self.pheromone_cache.store(self.maze, path_specification.get_end())
+            self.stop_steady_state()
+            self.maze = maze
+            self.graph = None
+            self.dead_ends = None
+
+    # Body of iter_generations, runs the generations on the current pheromones.
+    # @param spec Spefication of the route we wish to optimize
+    # @param deadline absolute time (time.time()) at which the generator stops
+    # @return generator of GenerationStatistics, one per generation
+    def run_generations(self, path_specification, deadline=None):
+        best_route = None
+        stagnant = 0
+        since_restart = 0
+        bounded = False
+        # tiles of the finished routes of the last union_generations generations
+        walked = deque(maxlen=self.union_generations)
+        self.stop_reason = None
+        self.generations_run = 0
+        self.ants_run = 0
+        self.ants_aborted = 0
+        self.ants_exhausted = 0
+        self.max_length = None
+        self.init_step_budget(path_specification)
+        for gen in range(0, self.generations):
+            if deadline is not None and time.time() >= deadline:
+                self.stop_reason = "deadline"
+                return
+            started = time.time()
+            self.generations_run = gen + 1
+            if self.steady_state:
+                self.routes, interrupted = self.run_steady_state(path_specification, gen, deadline)
+            else:
+                self.routes, interrupted = self.run_generation(path_specification, gen, deadline)
+            self.ants_run += len(self.routes)
+
+            route = None
             for r in self.routes:
-                if not r.done:
-                    continue
-                c += 1
-                if r.size() > l: l = r.size()
-                if r.size() < s: s = r.size()
-                a += r.size()
-                if r.shorter_than(route):
+                if route is None or self.is_better(r, route):
                     route = r
-            print("gen: " + str(gen) + ", shortest: " + str(s) + ", avg: " + str(
-                a / c) + ", longest: " + str(l))
+            if self.union_generations is not None and self.graph is None:
+                walked.append(self.get_walked_tiles(self.routes))
+                union = self.maze.get_shortest_route(path_specification.get_start(), path_specification.get_end(),
+                                                     np.logical_or.reduce(walked))
+                if union is not None and (route is None or self.is_better(union, route)):
+                    route = union
+            if route is not None and route.done and self.graph is None and self.shortcut_radius is not None:
+                route = route.shortcut(self.maze, self.shortcut_radius)
+            self.ants_aborted += sum(1 for r in self.routes if r.aborted)
+            self.ants_exhausted += sum(1 for r in self.routes if r.exhausted)
+            self.adapt_step_budget(self.routes)
+            if route is not None and (best_route is None or self.is_better(route, best_route)):
+                best_route = route
+                if self.abort_slack is not None and best_route.done:
+                    self.max_length = best_route.size() * self.abort_slack
+                stagnant = 0
+                since_restart = 0
+            else:
+                stagnant += 1
+                since_restart += 1
 
-        if q is not None:
-            q.put(route)
+            # measured on the pheromones the ants of this generation walked on, in steady state they already deposited
+            branching = self.maze.get_branching_factor(LAMBDA) if self.branching is not None else None
+            # an interrupted generation is not used for pheromone updates, only its routes are kept
+            if not self.steady_state and not interrupted and path_specification.start != path_specification.end:
+                if self.deposit == MAX_MIN and not bounded and best_route.done:
+                    # MAX-MIN starts at the upper bound, which is only known once there is a best route
+                    self.reset_pheromones(self.get_pheromone_bounds(best_route)[1])
+                    bounded = True
+                self.update_pheromones(self.routes, best_route=best_route)
+                if self.deposit == MAX_MIN and since_restart >= RESTART and best_route.done:
+                    self.reset_pheromones(self.get_pheromone_bounds(best_route)[1])
+                    since_restart = 0
+
+            # a caller that stops iterating now leaves the solve interrupted
+            self.stop_reason = "interrupted"
+            yield GenerationStatistics(gen, self.routes, route, best_route, time.time() - started, interrupted)
+            self.stop_reason = None
+
+            if interrupted:
+                self.stop_reason = "deadline"
+                return
+            # TSPData includes paths from C to C return early with 0 path
+            if path_specification.start == path_specification.end:
+                self.stop_reason = "start is end"
+                return
+            self.stop_reason = self.check_convergence(best_route, stagnant, branching)
+            if self.stop_reason is not None:
+                return
+
+        self.stop_reason = "generations"
+
+    # Run the ants of a single generation, stopping early when the deadline passes.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param gen number of the generation
+    # @param deadline absolute time at which the generation is interrupted (None never interrupts)
+    # @param ants amount of ants to run, defaults to the amount of ants per generation
+    # @return the routes of the finished ants and whether the generation was interrupted
+    def run_generation(self, path_specification, gen, deadline=None, ants=None):
+        if ants is None:
+            ants = self.ants_per_gen
+        self.prepare_ants(path_specification)
+        self.routes = []
+        seeds = self.get_ant_seeds(path_specification, gen, ants)
+        if not THREADING:
+            for ant_i in range(0, ants):
+                if deadline is not None and time.time() >= deadline:
+                    return self.routes, True
+                self.run(path_specification, seed=seeds[ant_i])
+                print("gen: " + str(gen) + ", ant: " + str(ant_i) + ", len " + str(len(self.routes[-0].get_route())))
+            return self.routes, False
+
+        # routes are kept in the order of the ants, not the order they finish in
+        found = [None] * ants
+        threads = []
+        queue: SimpleQueue[Any] = multiprocessing.SimpleQueue()
+        workers = ants if self.workers is None else max(1, self.workers)
+        received = 0
+        while received < ants:
+            while len(threads) < ants and len(threads) - received < workers:
+                t = multiprocessing.Process(target=self.run,
+                                            args=(path_specification, queue, seeds[len(threads)], len(threads)))
+                t.start()
+                threads.append(t)
+
+            if deadline is None or not queue.empty():
+                ant_i, route = queue.get()
+                found[ant_i] = route
+                received += 1
+            elif time.time() >= deadline:
+                # the queue is discarded, so killing an ant that is writing its route is safe
+                for t in threads:
+                    if t.is_alive():
+                        t.terminate()
+                self.routes = [r for r in found if r is not None]
+                return self.routes, True
+            else:
+                time.sleep(POLL_INTERVAL)
+        self.routes = found
+        return self.routes, False
+
+    # Run the next ants_per_gen ants of a steady state solve. Up to workers ants run at any time and a new ant is
+    # started as soon as one finishes, on the pheromones as they are at that moment. Every finished ant evaporates
+    # its share of the evaporation of a generation and deposits its route right away. Ants still running at the
+    # end of the call finish in the next one, so there is no barrier between generations.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param gen number of the generation
+    # @param deadline absolute time at which the running ants are stopped (None never stops them)
+    # @return the routes of the ants that finished and whether the deadline passed
+    def run_steady_state(self, path_specification, gen, deadline=None):
+        ants = self.ants_per_gen
+        # the clock of the evaporation is the amount of finished ants, ants_per_gen of them evaporate a generation
+        evaporation = 1 - (1 - self.evaporation) ** (1 / ants)
+        update = path_specification.start != path_specification.end
+        self.prepare_ants(path_specification)
+        self.routes = []
+        if not THREADING:
+            for ant_i in range(0, ants):
+                if deadline is not None and time.time() >= deadline:
+                    return self.routes, True
+                self.run(path_specification, seed=self.get_ant_seed(path_specification, gen, ant_i))
+                if update:
+                    self.update_pheromones(self.routes[-1:], evaporation)
+            return self.routes, False
+
+        if self.steady_queue is None:
+            self.steady_queue = multiprocessing.SimpleQueue()
+        workers = ants if self.workers is None else max(1, self.workers)
+        while len(self.routes) < ants:
+            while self.launched - self.arrived < workers:
+                n = self.launched
+                # arrivals update the pheromones, refresh the shared tables before forking the next ant
+                self.prepare_ants(path_specification)
+                seed = self.get_ant_seed(path_specification, n // ants, n % ants)
+                t = multiprocessing.Process(target=self.run, args=(path_specification, self.steady_queue, seed, n))
+                t.start()
+                self.steady_threads.append(t)
+                self.launched += 1
+
+            if deadline is None or not self.steady_queue.empty():
+                _, route = self.steady_queue.get()
+                self.arrived += 1
+                self.routes.append(route)
+                if update:
+                    self.update_pheromones([route], evaporation)
+            elif time.time() >= deadline:
+                self.stop_steady_state()
+                return self.routes, True
+            else:
+                time.sleep(POLL_INTERVAL)
+        self.steady_threads = [t for t in self.steady_threads if t.is_alive()]
+        return self.routes, False
+
+    # Compute the tables the ants of a solve read before forking, so all worker processes inherit them instead of
+    # building their own: the distance field for BFS, the heuristic table and the pheromones to the power ALPHA.
+    # @param path_specification Specification of the route we wish to optimize
+    def prepare_ants(self, path_specification):
+        end = path_specification.get_end()
+        if self.heuristic == BFS:
+            self.maze.get_distance_field(end)
+        if self.graph is None:
+            self.maze.get_heuristic_table(end, self.heuristic, heuristic_beta(self.heuristic))
+            self.maze.get_pheromone_power(ALPHA)
+            self.maze.get_direction_pheromone_power(ALPHA)
+
+    # Stop the ants still running for a steady state solve, their routes are discarded.
+    def stop_steady_state(self):
+        for t in self.steady_threads:
+            if t.is_alive():
+                t.terminate()
+        self.steady_threads = []
+        self.steady_queue = None
+        self.launched = 0
+        self.arrived = 0
+
+    # Seed the ants of this colony.
+    # @param seed seed of the ants (None seeds from the OS)
+    def set_seed(self, seed):
+        self.seed_sequence = np.random.SeedSequence(seed)
+
+    # Seeds of the ants of a generation. They only depend on the seed of the colony, the path specification,
+    # the generation and the index of the ant, so they are the same in any process and for any amount of workers.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param gen number of the generation
+    # @param ants amount of ants in the generation
+    # @return list of SeedSequence, one per ant
+    def get_ant_seeds(self, path_specification, gen, ants):
+        start = path_specification.get_start()
+        end = path_specification.get_end()
+        key = self.seed_sequence.spawn_key + (start.get_x(), start.get_y(), end.get_x(), end.get_y(), gen)
+        return np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=key).spawn(ants)
+
+    # Seed of a single ant, the same as the one get_ant_seeds gives it.
+    # @param path_specification Specification of the route we wish to optimize
+    # @param gen number of the generation
+    # @param ant_i index of the ant in the generation
+    # @return SeedSequence of the ant
+    def get_ant_seed(self, path_specification, gen, ant_i):
+        start = path_specification.get_start()
+        end = path_specification.get_end()
+        key = self.seed_sequence.spawn_key + (start.get_x(), start.get_y(), end.get_x(), end.get_y(), gen, ant_i)
+        return np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=key)
+
+    # Initial step budget of the ants for a solve, from the size of the maze and a lower bound on the route length
+    # (the BFS distance when the maze has the field cached, the Manhattan distance otherwise). Never more than ITERATIONS.
+    # @param path_specification Specification of the route we wish to optimize
+    def init_step_budget(self, path_specification):
+        if not self.adaptive_budget:
+            self.step_budget = ITERATIONS
+            return
+        start = path_specification.get_start()
+        end = path_specification.get_end()
+        field = self.maze.peek_distance_field(end)
+        if field is not None and self.maze.in_bounds(start) and field[start.get_x(), start.get_y()] >= 0:
+            distance = int(field[start.get_x(), start.get_y()])
         else:
-            return route
+            distance = abs(end.get_x() - start.get_x()) + abs(end.get_y() - start.get_y())
+        self.min_step_budget = DISTANCE_STEPS * distance
+        self.step_budget = int(min(ITERATIONS, max(CELL_STEPS * int(self.maze.open_tiles.sum()), self.min_step_budget)))
+
+    # Adapt the step budget after a generation. When most ants ran out of steps the budget is doubled,
+    # otherwise it follows the most steps a successful ant needed.
+    # @param routes the routes of the generation
+    def adapt_step_budget(self, routes):
+        if not self.adaptive_budget or not routes:
+            return
+        exhausted = sum(1 for r in routes if r.exhausted)
+        steps = [r.steps for r in routes if r.done]
+        if exhausted * 2 > len(routes):
+            if exhausted == len(routes):
+                print("all ants ran out of steps, budget: " + str(self.step_budget))
+            self.step_budget = min(ITERATIONS, self.step_budget * 2)
+        elif steps:
+            self.step_budget = int(min(ITERATIONS, max(self.min_step_budget, SUCCESS_STEPS * max(steps))))
+
+    # Empty map of dead ends for a solve. With worker processes it lives in shared memory, so dead ends found by
+    # one ant are seen by all ants started after it.
+    # @return width x length int8 array
+    def create_dead_end_map(self):
+        shape = (self.maze.get_width(), self.maze.get_length())
+        if THREADING:
+            return np.frombuffer(multiprocessing.RawArray("b", shape[0] * shape[1]), dtype=np.int8).reshape(shape)
+        return np.zeros(shape, dtype=np.int8)
 
-    def run(self, path_specification, qeueu=None):
-        ant = Ant(self.maze, path_specification)
+    # Evaporate and deposit pheromone for the routes of a generation, on the junction graph when the ants walk it.
+    # The maze then gets the edge pheromones spread over the corridors, so it always shows the current state.
+    # @param routes the routes of the generation
+    # @param evaporation evaporation factor, defaults to the one of the colony
+    # @param best_route best route so far, used by the deposit strategy (None deposits like ANT_SYSTEM)
+    def update_pheromones(self, routes, evaporation=None, best_route=None):
+        if evaporation is None:
+            evaporation = self.evaporation
+        routes, weights = self.merge_duplicates(*self.get_deposits(routes, best_route))
+        bounds = None
+        if self.deposit == MAX_MIN and best_route is not None and best_route.done:
+            bounds = self.get_pheromone_bounds(best_route)
+        if self.graph is None:
+            self.maze.evaporate(evaporation)
+            self.maze.add_pheromone_routes(routes, self.q, weights)
+            if bounds is not None:
+                self.maze.clip_pheromones(*bounds)
+            return
+        self.graph.evaporate(evaporation)
+        self.graph.add_pheromone_routes(routes, self.q, weights)
+        if bounds is not None:
+            self.graph.clip_pheromones(*bounds)
+        self.maze.set_pheromone_grid(self.graph.get_pheromone_grid())
+
+    # Routes that deposit pheromone after a generation and their weights, according to the deposit strategy.
+    # @param routes the routes of the generation
+    # @param best_route best route so far
+    # @return the routes and their weights (None for weight 1 each)
+    def get_deposits(self, routes, best_route):
+        if self.deposit == ANT_SYSTEM or best_route is None or not best_route.done:
+            return routes, None
+        if self.deposit == ELITIST:
+            return routes + [best_route], [1] * len(routes) + [self.elitist_weight]
+        done = sorted((r for r in routes if r.done and r.size() > 0), key=lambda r: r.size())
+        if self.deposit == RANK_BASED:
+            ranked = done[:RANKS - 1]
+            return ranked + [best_route], [RANKS - 1 - i for i in range(len(ranked))] + [RANKS]
+        return done[:1], None
+
+    # Merge identical finished routes, so each of them deposits once with the sum of their weights.
+    # Ants that converged often return the same route, this saves extracting its tiles again for every copy.
+    # @param routes the depositing routes
+    # @param weights their weights (None for weight 1 each)
+    # @return the distinct finished routes and their weights
+    def merge_duplicates(self, routes, weights):
+        merged = dict()
+        for i, r in enumerate(routes):
+            if r.done:
+                merged[r] = merged.get(r, 0) + (1 if weights is None else weights[i])
+        return list(merged.keys()), list(merged.values())
+
+    # Bounds of the MAX-MIN pheromones. The upper bound is the pheromone a tile of the best route converges to
+    # when it gets a deposit every generation.
+    # @param best_route the best route so far
+    # @return lower and upper bound
+    def get_pheromone_bounds(self, best_route):
+        high = self.q / (self.evaporation * best_route.size())
+        return high / (MIN_SPREAD * best_route.size()), high
+
+    # Reset the pheromones of all accessible tiles, or all edges of the junction graph, to a value.
+    # @param value the pheromone
+    def reset_pheromones(self, value):
+        if self.graph is None:
+            self.maze.set_pheromone_grid(np.full((self.maze.get_width(), self.maze.get_length()), value))
+            return
+        self.graph.reset(value)
+        self.maze.set_pheromone_grid(self.graph.get_pheromone_grid())
+
+    # Check whether a route is better than the best route so far, finished routes always beat unfinished ones.
+    # @param route the candidate route
+    # @param best_route the best route so far
+    # @return whether the candidate is better
+    def is_better(self, route, best_route):
+        if route.done != best_route.done:
+            return route.done
+        return route.shorter_than(best_route)
+
+    # Check the stopping criteria after a generation.
+    # @param best_route the best route so far
+    # @param stagnant amount of generations without improvement
+    # @param branching lambda-branching factor of the generation, measured before its deposit (None skips the check)
+    # @return the reason to stop, or None to continue
+    def check_convergence(self, best_route, stagnant, branching=None):
+        if not best_route.done:
+            return None
+        if self.target_length is not None and best_route.size() <= self.target_length:
+            return "target length"
+        if self.stagnation is not None and stagnant >= self.stagnation:
+            return "stagnation"
+        if self.branching is not None and branching is not None and branching <= self.branching:
+            return "branching"
+        return None
+
+    def run(self, path_specification, qeueu=None, seed=None, ant_i=0):
+        if self.graph is not None:
+            ant = GraphAnt(self.graph, path_specification, self.heuristic, self.max_length, self.step_budget, seed)
+        else:
+            ant = Ant(self.maze, path_specification, self.heuristic, self.dead_ends, self.max_length,
+                      self.step_budget, seed, self.meet)
         route = ant.find_route()
         if THREADING:
-            qeueu.put(route)
+            qeueu.put((ant_i, route))
         else:
             self.routes.append(route)
 
@@ -0,0 +1,69 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from array import array
+from collections import OrderedDict
+
+# Default amount of tours kept in the cache.
+CACHE_SIZE = 10000
+
+
+# Bounded least recently used cache of tour lengths, so duplicate individuals in a population are only evaluated once.
+class FitnessCache:
+
+    # Constructs a new cache.
+    # @param max_size maximum amount of tours kept before the least recently used one is evicted.
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Compact key of a tour, two bytes per product.
+    # @param chromosome product order
+    # @return key of the tour
+    @staticmethod
+    def key(chromosome):
+        return array("H", chromosome).tobytes()
+
+    # Length of a tour, evaluated only when it is not cached.
+    # @param tsp_data the TSP data.
+    # @param chromosome product order
+    # @return length of the tour
+    def get_tour_length(self, tsp_data, chromosome):
+        k = self.key(chromosome)
+        length = self.entries.get(k)
+        if length is not None:
+            self.hits += 1
+            self.entries.move_to_end(k)
+            return length
+
+        self.misses += 1
+        length = tsp_data.get_tour_length(chromosome)
+        self.entries[k] = length
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return length
+
+    # Fraction of lookups that were answered from the cache.
+    # @return hit rate between 0 and 1
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    # Remove all tours and statistics, needed when the TSP data changes.
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # Amount of cached tours
+    # @return size of the cache
+    def __len__(self):
+        return len(self.entries)
+
+    # String representation of the cache statistics
+    # @return representation
+    def __str__(self):
+        return "size: " + str(len(self)) + ", hits: " + str(self.hits) + ", misses: " + str(self.misses) \
+               + ", hit rate: " + str(round(self.hit_rate(), 3))
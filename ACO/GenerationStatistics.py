@@ -0,0 +1,52 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+
+# Record describing a single generation of the ant colony, as yielded by AntColonyOptimization.iter_generations.
+class GenerationStatistics:
+
+    # Constructs the statistics of a generation.
+    # @param generation number of the generation.
+    # @param routes the routes found by the ants of the generation.
+    # @param route the best route of the generation.
+    # @param best_route the best route found so far, including this generation.
+    # @param seconds time taken by the generation.
+    # @param interrupted whether the generation was cut short by a deadline.
+    def __init__(self, generation, routes, route, best_route, seconds, interrupted=False):
+        self.generation = generation
+        self.route = route
+        self.best_route = best_route
+        self.seconds = seconds
+        self.interrupted = interrupted
+        self.ants = len(routes)
+        self.aborted = sum(1 for r in routes if r.aborted)
+        self.exhausted = sum(1 for r in routes if r.exhausted)
+
+        sizes = [r.size() for r in routes if r.done]
+        self.completed = len(sizes)
+        self.shortest = min(sizes) if sizes else None
+        self.longest = max(sizes) if sizes else None
+        self.average = sum(sizes) / len(sizes) if sizes else None
+
+    # Number of the generation getter
+    # @return the generation
+    def get_generation(self):
+        return self.generation
+
+    # Best route of this generation getter
+    # @return the route
+    def get_route(self):
+        return self.route
+
+    # Best route so far getter
+    # @return the route
+    def get_best_route(self):
+        return self.best_route
+
+    # String representation of the generation
+    # @return representation
+    def __str__(self):
+        return "gen: " + str(self.generation) + ", shortest: " + str(self.shortest) + ", avg: " + str(self.average) \
+               + ", longest: " + str(self.longest) + ", done: " + str(self.completed) + "/" + str(self.ants) \
+               + ", aborted: " + str(self.aborted) + ", ran out: " + str(self.exhausted) \
+               + ", time: " + str(round(self.seconds, 3))
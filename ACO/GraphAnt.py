@@ -0,0 +1,155 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from itertools import accumulate
+
+import numpy as np
+from src.Ant import ITERATIONS, ALPHA, EUCLID, BFS, heuristic_beta
+from src.Route import Route
+from src.RandomStream import RandomStream
+
+# largest difference in BFS distance used in the heuristic of an edge, keeps 2 ** x finite
+MAX_EXPONENT = 64
+
+
+# Ant that walks the junction graph of a maze instead of the tiles. Every step follows a whole corridor,
+# loops are erased by cutting the path back to the node that was reached again and the corridor that closed
+# the loop is not taken again by this ant.
+class GraphAnt:
+
+    # Constructor for a graph ant.
+    # @param graph the JunctionGraph the ant will be running in, the start and end must be nodes.
+    # @param spec The path specification consisting of a start coordinate and an end coordinate.
+    # @param heuristic EUCLID for the distance to the goal as the crow flies, BFS for the distance through the maze.
+    # @param max_length the ant gives up once its route plus a lower bound to the goal exceeds this (None disables).
+    # @param max_steps amount of corridors the ant may follow before it gives up.
+    # @param seed seed of the random choices of the ant (None seeds from the OS).
+    def __init__(self, graph, path_specification, heuristic=EUCLID, max_length=None, max_steps=ITERATIONS,
+                 seed=None):
+        self.graph = graph
+        self.max_length = max_length
+        self.max_steps = max_steps
+        self.start = path_specification.get_start()
+        self.end = path_specification.get_end()
+        self.source = graph.get_node(self.start)
+        self.goal = graph.get_node(self.end)
+        self.rand = RandomStream(seed)
+        self.beta = heuristic_beta(heuristic)
+
+        nodes = graph.node_cells
+        field = graph.maze.peek_distance_field(self.end)
+        if field is not None:
+            self.lower_bounds = np.maximum(field[nodes[:, 0], nodes[:, 1]], 0)
+        else:
+            self.lower_bounds = np.abs(self.end.get_x() - nodes[:, 0]) + np.abs(self.end.get_y() - nodes[:, 1])
+        if heuristic == BFS:
+            field = graph.maze.get_distance_field(self.end)
+            self.distances = field[nodes[:, 0], nodes[:, 1]]
+            self.eta = None
+        else:
+            squared = (self.end.get_x() - nodes[:, 0]) ** 2 + (self.end.get_y() - nodes[:, 1]) ** 2
+            self.eta = np.where(squared != 0, squared, 1) ** self.beta
+            self.distances = None
+
+    # Method that performs a single run through the graph by the ant.
+    # @return The route the ant found, with the edges it used.
+    def find_route(self):
+        path = [self.source]
+        edges = []
+        directions = []
+        index = {self.source: 0}
+        seen = {self.source}
+        blocked = set()
+        blocked_edges = set()
+        avoid = set()
+        done = False
+        aborted = False
+        exhausted = True
+        length = 0
+
+        steps = 0
+        for steps in range(0, self.max_steps):
+            node = path[-1]
+            if node == self.goal:
+                done = True
+                exhausted = False
+                break
+            if self.max_length is not None and length + self.lower_bounds[node] > self.max_length:
+                aborted = True
+                exhausted = False
+                break
+
+            options = []
+            weights = []
+            for e, target, dirs in self.graph.adjacency[node]:
+                if e in avoid or e in blocked_edges or target in blocked:
+                    continue
+                w = self.calc_pheromone(e, node, target)
+                if target in seen:
+                    w *= 0.1
+                options.append((e, target, dirs))
+                weights.append(w)
+
+            if sum(weights) == 0:
+                # dead end, step back one corridor
+                if node == self.source:
+                    if not blocked_edges and not blocked:
+                        exhausted = False
+                        break
+                    # everything was blocked by closed loops, start over with a clean slate
+                    blocked.clear()
+                    blocked_edges.clear()
+                    avoid = set()
+                    continue
+                blocked.add(node)
+                del index[path.pop()]
+                avoid = {edges.pop()}
+                length -= len(directions.pop())
+                continue
+
+            e, target, dirs = options[self.rand.choose(list(accumulate(weights)))]
+            if target in index:
+                # loop, cut the path back to the node that was reached again
+                k = index[target]
+                for n in path[k + 1:]:
+                    del index[n]
+                del path[k + 1:]
+                del edges[k:]
+                del directions[k:]
+                length = sum(len(dirs) for dirs in directions)
+                blocked_edges.add(e)
+                avoid = {edges[-1]} if edges else set()
+            else:
+                path.append(target)
+                edges.append(e)
+                directions.append(dirs)
+                length += len(dirs)
+                index[target] = len(path) - 1
+                seen.add(target)
+                avoid = {e}
+
+        route = Route(self.start)
+        for dirs in directions:
+            for d in dirs:
+                route.add(d)
+        route.edges = edges
+        route.done = done
+        route.aborted = aborted
+        route.exhausted = exhausted
+        route.steps = steps
+        route.end = self.end
+        return route
+
+    # Weight of an edge, its pheromone to the power ALPHA times the heuristic of its end node.
+    # @param e the edge
+    # @param node the node the ant is at
+    # @param target the node at the other end of the edge
+    # @return the weight, 0 when the goal cannot be reached from the target
+    def calc_pheromone(self, e, node, target):
+        tau = self.graph.pheromones[e] ** ALPHA
+        if self.distances is None:
+            return tau * self.eta[target]
+        if self.distances[target] < 0:
+            return 0
+        exponent = min(MAX_EXPONENT, max(-MAX_EXPONENT, int(self.distances[node]) - int(self.distances[target])))
+        return tau * 2.0 ** (self.beta * exponent)
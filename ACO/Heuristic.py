@@ -0,0 +1,7 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Heuristics for the attractiveness of a direction, shared by the ants and the heuristic tables of the maze.
+# EUCLID weighs a step by the distance to the goal as the crow flies, BFS by the distance through the maze.
+EUCLID = "euclid"
+BFS = "bfs"
@@ -0,0 +1,149 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+from src.Direction import Direction
+from src.Ant import STEPS
+
+
+# Compressed form of a maze for the ants. Nodes are junctions, dead ends and the endpoints of a solve,
+# edges are the corridors between them with their length and directions. Pheromone is kept per edge,
+# so an ant makes one choice per junction instead of one per tile.
+class JunctionGraph:
+
+    # Constructs the junction graph of a maze.
+    # @param maze the maze to compress.
+    # @param endpoints coordinates that must be nodes, e.g. the start and end of a solve.
+    def __init__(self, maze, endpoints):
+        self.maze = maze
+        open_tiles = maze.open_tiles
+        padded = np.pad(open_tiles, 1).astype(np.int8)
+        neighbours = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+        is_node = open_tiles & (neighbours != 2)
+        for c in endpoints:
+            if maze.in_bounds(c) and open_tiles[c.get_x(), c.get_y()]:
+                is_node[c.get_x(), c.get_y()] = True
+
+        self.nodes = [tuple(cell) for cell in np.argwhere(is_node).tolist()]
+        self.node_index = {cell: i for i, cell in enumerate(self.nodes)}
+        # outgoing corridors per node as (edge id, target node, directions)
+        self.adjacency = [[] for _ in self.nodes]
+        # cells of every edge, excluding both end nodes
+        self.edge_cells = []
+        self.lengths = []
+        edge_ids = dict()
+        for i, (x, y) in enumerate(self.nodes):
+            for d in Direction:
+                dx, dy = STEPS[d.value]
+                if not maze.in_bounds_xy(x + dx, y + dy) or not open_tiles[x + dx, y + dy]:
+                    continue
+                directions, cells = self.trace(x, y, d, is_node)
+                if directions is None:
+                    continue
+                target = self.node_index[cells[-1]]
+                if target == i:
+                    continue
+                # both directions of a corridor share an edge id
+                last = cells[-2] if len(cells) > 1 else (x, y)
+                key = tuple(sorted([((x, y), cells[0]), (cells[-1], last)]))
+                if key not in edge_ids:
+                    edge_ids[key] = len(self.lengths)
+                    self.lengths.append(len(directions))
+                    self.edge_cells.append(cells[:-1])
+                self.adjacency[i].append((edge_ids[key], target, directions))
+        self.lengths = np.array(self.lengths, dtype=float)
+        self.pheromones = np.ones(len(self.lengths))
+
+        # lookup arrays to spread the edge pheromones over the maze
+        self.cell_edge = np.full((maze.get_width(), maze.get_length()), -1)
+        for e, cells in enumerate(self.edge_cells):
+            for cell in cells:
+                self.cell_edge[cell] = e
+        self.node_cells = np.array(self.nodes, dtype=int).reshape(-1, 2)
+        self.adjacent_node = np.array([i for i, adjacent in enumerate(self.adjacency) for _ in adjacent], dtype=int)
+        self.adjacent_edge = np.array([e for adjacent in self.adjacency for e, _, _ in adjacent], dtype=int)
+
+    # Follow a corridor until the next node.
+    # @param x x position of the node the corridor starts at
+    # @param y y position of the node the corridor starts at
+    # @param direction first step of the corridor
+    # @param is_node width x length array marking the nodes
+    # @return the directions and the visited cells (ending with the node), or None for a corridor looping forever
+    def trace(self, x, y, direction, is_node):
+        directions = []
+        cells = []
+        d = direction
+        while True:
+            dx, dy = STEPS[d.value]
+            x, y = x + dx, y + dy
+            directions.append(d)
+            cells.append((x, y))
+            if is_node[x, y]:
+                return directions, cells
+            if len(cells) > self.maze.open_tiles.size:
+                return None, None
+            back = Direction((d.value + 2) % 4)
+            for nd in Direction:
+                if nd == back:
+                    continue
+                ndx, ndy = STEPS[nd.value]
+                if self.maze.in_bounds_xy(x + ndx, y + ndy) and self.maze.open_tiles[x + ndx, y + ndy]:
+                    d = nd
+                    break
+
+    # Node index of a coordinate
+    # @param coordinate the coordinate, must be a node
+    # @return the index of the node
+    def get_node(self, coordinate):
+        return self.node_index[(coordinate.get_x(), coordinate.get_y())]
+
+    # Reset the edge pheromones to a start value
+    # @param value the start value
+    def reset(self, value=1.0):
+        self.pheromones = np.full(len(self.lengths), float(value))
+
+    # Evaporate pheromone
+    # @param rho evaporation factor
+    def evaporate(self, rho):
+        self.pheromones *= 1 - rho
+
+    # Update the pheromones along the edges of finished routes, q / route size on every edge once.
+    # @param routes routes found by graph ants, carrying their edges
+    # @param q Normalization factor for amount of dropped pheromone
+    # @param weights weight of the deposit of every route (None deposits every route once)
+    def add_pheromone_routes(self, routes, q, weights=None):
+        edges = []
+        amounts = []
+        for i, r in enumerate(routes):
+            if r.done and r.size() > 0:
+                ids = np.unique(r.edges)
+                edges.append(ids)
+                amounts.append(np.full(len(ids), q * (1 if weights is None else weights[i]) / r.size()))
+        if edges:
+            deposit = np.bincount(np.concatenate(edges), np.concatenate(amounts), minlength=len(self.pheromones))
+            self.pheromones += deposit
+
+    # Keep the edge pheromones within bounds
+    # @param low lower bound
+    # @param high upper bound
+    def clip_pheromones(self, low, high):
+        np.clip(self.pheromones, low, high, out=self.pheromones)
+
+    # Pheromones of the edges spread over the tiles of their corridors, so they can be inspected on the maze.
+    # Nodes get the highest pheromone of their edges.
+    # @return width x length array of pheromones
+    def get_pheromone_grid(self):
+        grid = np.where(self.cell_edge >= 0, self.pheromones[self.cell_edge], 0.0)
+        node_pheromones = np.zeros(len(self.nodes))
+        np.maximum.at(node_pheromones, self.adjacent_node, self.pheromones[self.adjacent_edge])
+        degree = np.bincount(self.adjacent_node, minlength=len(self.nodes))
+        grid[self.node_cells[:, 0], self.node_cells[:, 1]] = np.where(degree > 0, node_pheromones, 1.0)
+        return grid
+
+    # Set the edge pheromones to the mean of a pheromone grid over their corridors and end nodes.
+    # @param grid width x length array of pheromones
+    def set_pheromones_from_grid(self, grid):
+        for i, adjacent in enumerate(self.adjacency):
+            for e, target, _ in adjacent:
+                cells = self.edge_cells[e] + [self.nodes[i], self.nodes[target]]
+                self.pheromones[e] = np.mean([grid[cell] for cell in cells])
@@ -0,0 +1,42 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Amount of uniform numbers drawn from the generator at once.
+BLOCK = 256
+
+
+# Source of random choices for a single ant. Uniform numbers are drawn from a seeded NumPy Generator in blocks,
+# so a step costs an array lookup instead of a call into the generator.
+class RandomStream:
+
+    # Constructs a new stream.
+    # @param seed seed of the generator, anything np.random.default_rng accepts (None seeds from the OS).
+    # @param block amount of uniform numbers drawn at once.
+    def __init__(self, seed=None, block=BLOCK):
+        self.generator = np.random.default_rng(seed)
+        self.block = block
+        self.uniforms = []
+        self.next = 0
+
+    # Next uniform number in [0, 1)
+    # @return the number
+    def uniform(self):
+        if self.next == len(self.uniforms):
+            self.uniforms = self.generator.random(self.block).tolist()
+            self.next = 0
+        self.next += 1
+        return self.uniforms[self.next - 1]
+
+    # Pick an index with probability proportional to its weight.
+    # @param cumulative cumulative weights, the last one is the total and must be positive
+    # @return the index, never one with a zero weight
+    def choose(self, cumulative):
+        i = bisect_right(cumulative, self.uniform() * cumulative[-1])
+        if i == len(cumulative):
+            # the product rounded up to the total, take the last index with a weight
+            i = bisect_left(cumulative, cumulative[-1])
+        return i
@@ -2,8 +2,20 @@ import os, sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
+import numpy as np
 from src.Direction import Direction
 
+# unit moves of the directions, indexed by the value of the direction
+DELTAS = np.array([(1, 0), (0, -1), (-1, 0), (0, 1)])
+# maximum length of the detours replaced by Route.shortcut
+SHORTCUT_RADIUS = 8
+# polynomial rolling hash of the directions, modulo a Mersenne prime
+HASH_BASE = 5
+HASH_MOD = 2 ** 61 - 1
+# directions indexed by their value and the bit offsets of the four directions packed in a byte of a pickled route
+DIRECTIONS = tuple(sorted(Direction, key=lambda d: d.value))
+PACK_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
 
 # Class representing a route.
 class Route:
@@ -12,14 +24,24 @@ class Route:
     # @param start starting coordinate
     def __init__(self, start):
         self.route = []
+        # rolling hash of the first i directions at index i, kept up to date by add, remove_last and truncate
+        self.hashes = [0]
         self.start = start
         self.end = None
         self.done = False
+        # edges of the junction graph the route was found on, None for routes found tile by tile
+        self.edges = None
+        # whether the ant gave up because the route could not beat the best route of the colony
+        self.aborted = False
+        # amount of steps the ant took and whether it ran out of steps before reaching the end
+        self.steps = 0
+        self.exhausted = False
 
     # After taking a step we add the direction we moved in
     # @param dir Direction we moved in
     def add(self, dir):
         self.route.append(dir)
+        self.get_prefix_hashes().append((self.hashes[-1] * HASH_BASE + dir.value + 1) % HASH_MOD)
         return
 
     # Returns the length of the route
@@ -43,11 +65,133 @@ class Route:
     def shorter_than(self, other):
         return self.size() < other.size()
 
+    # All cells on the route, from the start up to and including the last cell.
+    # @return (size + 1) x 2 int array of x, y positions
+    def get_cells(self):
+        cells = np.empty((len(self.route) + 1, 2), dtype=np.int64)
+        cells[0] = (self.start.get_x(), self.start.get_y())
+        if self.route:
+            steps = DELTAS[np.fromiter((d.value for d in self.route), dtype=np.int64, count=len(self.route))]
+            cells[1:] = cells[0] + np.cumsum(steps, axis=0)
+        return cells
+
+    # The part of the route up to the first time it reaches a coordinate.
+    # @param end the coordinate to stop at
+    # @return a finished route from the same start to end, or None when the route does not reach end
+    def get_prefix(self, end):
+        cur = self.start
+        prefix = Route(self.start)
+        prefix.end = end
+        for d in self.route:
+            if cur == end:
+                break
+            prefix.add(d)
+            cur = cur.add_direction(d)
+        if not cur == end:
+            return None
+        prefix.done = True
+        return prefix
+
+    # Join this route with a route from another start that ends at the same cell, giving a route from the start of
+    # this route to the start of the other one. Loops where the two parts cross are erased.
+    # @param other route ending at the last cell of this route
+    # @return the finished route
+    def join(self, other):
+        directions = self.route + [Direction((d.value + 2) % 4) for d in reversed(other.route)]
+        joined = Route.from_directions(self.start, directions)
+        joined.end = other.start
+        joined.done = True
+        return joined
+
+    # Shorten the route by replacing detours with shortest paths. From every cell on the route a breadth first
+    # search of at most radius steps looks for cells further along the route that it reaches in fewer steps than
+    # the route does; the part up to the furthest of them is replaced by the path the search found. The searches
+    # are bounded, so the time is linear in the length of the route.
+    # @param maze the maze the route runs in
+    # @param radius maximum length of the paths that replace a detour
+    # @return the shortened route, with the same start, end and done flag
+    def shortcut(self, maze, radius=SHORTCUT_RADIUS):
+        cells = [tuple(cell) for cell in self.get_cells().tolist()]
+        position = {cell: i for i, cell in enumerate(cells)}
+        directions = []
+        i = 0
+        while i < len(self.route):
+            distance, parent = maze.local_search(cells[i][0], cells[i][1], radius)
+            furthest = i + 1
+            for cell, d in distance.items():
+                j = position.get(cell, -1)
+                if j > furthest and d < j - i:
+                    furthest = j
+            if furthest == i + 1:
+                directions.append(self.route[i])
+            else:
+                # walk the search back from the furthest cell to the current one
+                detour = []
+                x, y = cells[furthest]
+                while (x, y) != cells[i]:
+                    d = parent[(x, y)]
+                    detour.append(d)
+                    dx, dy = DELTAS[d.value]
+                    x, y = x - int(dx), y - int(dy)
+                directions.extend(reversed(detour))
+            i = furthest
+        route = Route.from_directions(self.start, directions)
+        route.end = self.end
+        route.done = self.done
+        return route
+
+    # Route following a list of directions, with the loops in it erased.
+    # @param start the starting coordinate
+    # @param directions the directions
+    # @return the route
+    @staticmethod
+    def from_directions(start, directions):
+        route = Route(start)
+        x, y = start.get_x(), start.get_y()
+        cells = [(x, y)]
+        index = {(x, y): 0}
+        for d in directions:
+            dx, dy = DELTAS[d.value]
+            x, y = x + int(dx), y + int(dy)
+            k = index.get((x, y))
+            if k is None:
+                index[(x, y)] = len(cells)
+                cells.append((x, y))
+                route.add(d)
+            else:
+                # the route crossed itself, cut the loop
+                for cell in cells[k + 1:]:
+                    del index[cell]
+                del cells[k + 1:]
+                route.truncate(k)
+        return route
+
     # Take a step back in the route and return the last direction
     # @return last direction
     def remove_last(self):
+        self.get_prefix_hashes().pop()
         return self.route.pop()
 
+    # Keep only the first directions of the route
+    # @param size amount of directions to keep
+    def truncate(self, size):
+        del self.route[size:]
+        del self.get_prefix_hashes()[size + 1:]
+
+    # Rolling hash of the directions, equal routes from the same start have equal hashes
+    # @return the hash
+    def get_hash(self):
+        return self.packed_hash if self.hashes is None else self.hashes[-1]
+
+    # Prefix hashes of the route, rebuilt from the directions for a route that was unpickled with only its hash
+    # @return list with the hash of the first i directions at index i
+    def get_prefix_hashes(self):
+        if self.hashes is None:
+            self.hashes = [0]
+            for dir in self.route:
+                self.hashes.append((self.hashes[-1] * HASH_BASE + dir.value + 1) % HASH_MOD)
+        return self.hashes
+
     # Build a string representing the route as the format specified in the manual.
     # @return string with the specified format of a route
     def __str__(self):
@@ -61,7 +205,42 @@ class Route:
     # @param other Other route
     # @return boolean whether they are equal
     def __eq__(self, other):
-        return self.start == other.start and self.route == other.route
+        return self.get_hash() == other.get_hash() and self.start == other.start and self.route == other.route
+
+    # Hash consistent with the equals method, so routes can be counted in a dict
+    # @return the hash
+    def __hash__(self):
+        return self.get_hash()
+
+    # Pickle the route as its hash and its directions packed four to a byte, instead of a list of enum members and
+    # the prefix hashes. Every ant of a generation sends its route to the colony this way.
+    # @return the attributes to pickle
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("hashes", None)
+        state.pop("packed_hash", None)
+        values = np.zeros(-(-len(self.route) // 4) * 4, dtype=np.uint8)
+        values[:len(self.route)] = [dir.value for dir in self.route]
+        state["route"] = (values.reshape(-1, 4) << PACK_SHIFTS).sum(axis=1, dtype=np.uint8).tobytes()
+        state["size"] = len(self.route)
+        state["hash"] = self.get_hash()
+        return state
+
+    # Restore a pickled route, its prefix hashes are only rebuilt when the route is changed. Routes pickled by
+    # older versions hold a list of directions, attributes missing from them get their default value.
+    # @param state the pickled attributes
+    def __setstate__(self, state):
+        state = dict(state)
+        self.__init__(state["start"])
+        self.hashes = None
+        if "hash" in state:
+            packed = np.frombuffer(state.pop("route"), dtype=np.uint8)
+            values = ((packed[:, None] >> PACK_SHIFTS) & 3).ravel()[:state.pop("size")]
+            state["route"] = [DIRECTIONS[v] for v in values.tolist()]
+            self.packed_hash = state.pop("hash")
+        self.__dict__.update(state)
+        if not hasattr(self, "packed_hash"):
+            self.get_prefix_hashes()
 
     # Method that implements the specified format for writing a route to a file.
     # @param filePath path to route file.
@@ -8,14 +8,32 @@ ALPHA = 1
 BETA = 0.2
 DEBUG = False
 
+# with the BFS heuristic a step towards the goal is 2 ** BFS_BETA times as attractive, a step away 2 ** BFS_BETA less
+BFS_BETA = 2
+
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-import random
-from src.Route import Route
+import numpy as np
+from src.Heuristic import EUCLID, BFS
+from src.Route import Route, DELTAS
 from src.Coordinate import Coordinate
 from src.Direction import Direction
+from src.RandomStream import RandomStream
 from src.SurroundingPheromone import SurroundingPheromone
 
+# unit moves of the directions as plain tuples, indexed by the value of the direction
+STEPS = [tuple(delta) for delta in DELTAS.tolist()]
+# the directions in the order of their value, the order of the cumulative weights of a step
+DIRECTIONS = list(Direction)
+
+
+
+# Exponent of a heuristic, read when it is needed so changes to BETA and BFS_BETA take effect.
+# @param heuristic EUCLID or BFS
+# @return BFS_BETA for BFS, BETA otherwise
+def heuristic_beta(heuristic):
+    return BFS_BETA if heuristic == BFS else BETA
+
 
 # Class that represents the ants functionality.
 class Ant:
@@ -24,156 +42,192 @@ class Ant:
     # Constructor for ant taking a Maze and PathSpecification.
     # @param maze Maze the ant will be running in.
     # @param spec The path specification consisting of a start coordinate and an end coordinate.
-    def __init__(self, maze, path_specification):
-        self.blocked = dict()
+    # @param heuristic EUCLID for the distance to the goal as the crow flies, BFS for the distance through the maze.
+    # @param dead_ends width x length array shared by the colony, tiles proven to be dead ends are set to 1 (None disables).
+    # @param max_length the ant gives up once its route plus a lower bound to the goal exceeds this (None disables).
+    # @param max_steps amount of steps the ant may take before it gives up.
+    # @param seed seed of the random choices of the ant (None seeds from the OS).
+    # @param meet width x length bool array of tiles that also finish the route, besides the end (None disables).
+    def __init__(self, maze, path_specification, heuristic=EUCLID, dead_ends=None, max_length=None,
+                 max_steps=ITERATIONS, seed=None, meet=None):
+        self.dead_ends = dead_ends
+        self.max_length = max_length
+        self.max_steps = max_steps
+        self.meet = meet
         self.maze = maze
         self.start: Coordinate = path_specification.get_start()
         self.end: Coordinate = path_specification.get_end()
         self.current_position: Coordinate = self.start
-        self.rand = random
+        self.rand = RandomStream(seed)
+        # tables shared by all ants of a solve, a step only reads them
+        self.eta = maze.get_heuristic_table(self.end, heuristic, heuristic_beta(heuristic))
+        self.tau = maze.get_pheromone_power(ALPHA)
+        # pheromone per direction when the maze keeps it, the tiles then only tell walls apart
+        self.tau_directions = maze.get_direction_pheromone_power(ALPHA)
+        self.field = maze.peek_distance_field(self.end)
+        # tiles this ant will not enter again
+        self.blocked = np.zeros((maze.get_width(), maze.get_length()), dtype=bool)
 
     # Method that performs a single run through the maze by the ant.
+    # The path is kept as a stack of tile ids with a map from tile to its index on the stack,
+    # so a loop is erased by truncating the stack to the index of the tile that was reached again.
     # @return The route the ant found through the maze.
     def find_route(self):
+        length = self.maze.get_length()
         route = Route(self.start)
+        directions = route.get_route()
         not_dir = None
-        prev_pos = self.start
-        seen = dict({self.current_position.__str__(): 1})
-        visited = dict({self.current_position.__str__(): 1})
-
-        for r in range(0, ITERATIONS):
-            if self.current_position == self.end:
+        x, y = self.start.get_x(), self.start.get_y()
+        end = (self.end.get_x(), self.end.get_y())
+        prev = (x, y)
+        seen = np.zeros(self.blocked.shape, dtype=bool)
+        seen[x, y] = True
+        # stack of tile ids (x * length + y) on the route and the index of every tile on it, -1 when not on it
+        path = np.empty(self.blocked.size + 1, dtype=np.int64)
+        index = np.full(self.blocked.size, -1, dtype=np.int64)
+        path[0] = x * length + y
+        index[path[0]] = 0
+        top = 1
+
+        for r in range(0, self.max_steps):
+            route.steps = r
+            if (x, y) == end or (self.meet is not None and self.meet[x, y]):
                 route.done = True
                 if DEBUG:
                     self.maze.write_to_file("./../data/maze.csv", self.blocked)
                 break
-            if r >= ITERATIONS - 1:
+            if r >= self.max_steps - 1:
                 if DEBUG:
                     self.maze.write_to_file("./../data/maze.csv", self.blocked)
-                print("ran out")
-            s_pheromones: SurroundingPheromone = self.maze.get_surrounding_pheromone(self.current_position)
+                route.exhausted = True
+            if self.max_length is not None and top - 1 + self.distance_to_goal(x, y) > self.max_length:
+                route.aborted = True
+                break
+
+            # cumulative weights over all 4 directions, a direction the ant may not take adds nothing
             total = 0
+            cumulative = [0.0] * 4
             #  calc Pheromone on all paths departing from cur loc i
-            for j in Direction:
-                dir_cord = self.current_position.add_direction(j)
-                if dir_cord == prev_pos or j == not_dir or dir_cord.__str__() in self.blocked:
-                    continue
-                mod = 1
-                if dir_cord.__str__() in seen:
-                    mod = 0.1
-                total += self.calc_pheromone(j, s_pheromones) * mod
-
-            prob_map_for_possible_dirs = dict()
-            if total != 0:
-                # calc prob
-                for i in Direction:
-                    c = self.current_position.add_direction(i)
-                    if c == prev_pos or i == not_dir or c.__str__() in self.blocked:
-                        continue
+            for j in DIRECTIONS:
+                dx, dy = STEPS[j.value]
+                nx, ny = x + dx, y + dy
+                if not (self.tau[nx + 1, ny + 1] == 0 or (nx, ny) == prev or j == not_dir
+                        or self.is_blocked(nx, ny)):
                     mod = 1
-                    if c.__str__() in seen:
+                    if seen[nx, ny]:
                         mod = 0.1
+                    total += self.calc_pheromone(j, x, y) * mod
+                cumulative[j.value] = total
 
-                    p = self.calc_pheromone(i, s_pheromones) * mod / total
-                    prob_map_for_possible_dirs[i] = p
-
+            if total != 0:
                 # get random dir based on the probability
-                direction = self.rand.choices(
-                    list(prob_map_for_possible_dirs.keys()),
-                    weights=list(prob_map_for_possible_dirs.values()),
-                    k=1).pop()
-
-                route.add(direction)
-                prev_pos = self.current_position
-                self.current_position = self.current_position.add_direction(direction)
-
-                if not_dir is not None:
-                    not_dir = None
-
-                # remove loop
-                if self.current_position.__str__() in visited:
+                direction = DIRECTIONS[self.rand.choose(cumulative)]
+                dx, dy = STEPS[direction.value]
+                nx, ny = x + dx, y + dy
+                not_dir = None
+                k = index[nx * length + ny]
+                if k >= 0:
+                    # remove loop: block the tile that closed it if it has only 2 directions
+                    if self.num_of_dirs(x, y) <= 2:
+                        self.blocked[x, y] = True
                     if DEBUG:
-                        print("loop: ", end=" ")
-                        print("(" + self.current_position.__str__() + "): " + str(self.num_of_dirs()), end=", ")
-
-                    # go back one step
-                    go_to_c = self.current_position
-                    not_dir = route.remove_last()
-                    self.current_position = self.current_position.subtract_direction(not_dir)
-
-                    # block all that only have 2 directions
-                    if self.num_of_dirs() <= 2:
-                        self.blocked[self.current_position.__str__()] = 1
-                    visited.popitem()
-
-                    # go back to start of loop
-                    while self.current_position != go_to_c:
-                        if DEBUG:
-                            print("(" + self.current_position.__str__() + "): " + str(self.num_of_dirs()), end=", ")
-                        not_dir = route.remove_last()
-                        self.current_position = self.current_position.subtract_direction(not_dir)
-                        visited.popitem()
-
-                    if DEBUG:
-                        print("")
-                    # reset last position
-                    prev_pos = self.get_prev_pos(route, visited)
-                    if DEBUG:
-                        self.maze.write_to_file("./../data/maze.csv", self.blocked)
-
-                visited[self.current_position.__str__()] = 1
-                seen[self.current_position.__str__()] = 1
+                        print("loop: (" + str(nx) + ", " + str(ny) + "): " + str(top - 1 - k) + " steps")
+                    # go back to start of loop, the direction it started with is not taken again
+                    not_dir = directions[k]
+                    index[path[k + 1:top]] = -1
+                    top = k + 1
+                    route.truncate(k)
+                    x, y = nx, ny
+                    prev = self.get_prev_pos(path, top, length)
+                else:
+                    route.add(direction)
+                    prev = (x, y)
+                    x, y = nx, ny
+                    path[top] = x * length + y
+                    index[path[top]] = top
+                    top += 1
+                seen[x, y] = True
             else:
                 if DEBUG:
-                    print("block: ", end=" ")
-                    print("(" + self.current_position.__str__() + "): " + str(self.num_of_dirs()), end=", ")
+                    print("block: (" + str(x) + ", " + str(y) + "): " + str(self.num_of_dirs(x, y)))
 
                 # backtrack
-                not_dir, prev_pos = self.backtrack(route, visited)
-                if DEBUG:
-                    print("")
+                not_dir = None
+                while self.num_of_dirs(x, y) < 2 and top > 1:
+                    not_dir = route.remove_last()
+                    self.blocked[x, y] = True
+                    self.publish_dead_end(x, y)
+                    top -= 1
+                    index[path[top]] = -1
+                    x, y = divmod(int(path[top - 1]), length)
+                prev = self.get_prev_pos(path, top, length)
+        self.current_position = Coordinate(x, y)
         route.end = self.end
         return route
 
-    def get_prev_pos(self, route, visited):
-        if len(visited) > 1:
-            last = route.remove_last()
-            prev_pos = self.current_position.subtract_direction(last)
-            route.add(last)
-        else:
-            prev_pos = self.start
-        return prev_pos
-
-    def backtrack(self, route, visited):
-        not_dir = None
-        while self.num_of_dirs() < 2 and not (self.current_position == self.start):
-            not_dir = route.remove_last()
-            self.blocked[self.current_position.__str__()] = 1
-            self.current_position = self.current_position.subtract_direction(not_dir)  # move back
-            visited.popitem()
-            if DEBUG:
-                print("(" + self.current_position.__str__() + "): " + str(self.num_of_dirs()), end=", ")
-
-        prev_pos = self.get_prev_pos(route, visited)
-        return not_dir, prev_pos
-
-    def num_of_dirs(self):
+    # Tile before the last tile on the path
+    # @param path stack of tile ids
+    # @param top size of the stack
+    # @param length length of the maze
+    # @return x, y of the tile, the start when the path is a single tile
+    def get_prev_pos(self, path, top, length):
+        if top > 1:
+            return divmod(int(path[top - 2]), length)
+        return self.start.get_x(), self.start.get_y()
+
+    # Amount of open tiles around a tile that are not blocked
+    # @param x x of the tile
+    # @param y y of the tile
+    # @return amount of directions the ant could take
+    def num_of_dirs(self, x, y):
         ret = 0
-        for d in Direction:
-            c = self.current_position.add_direction(d)
-            if self.maze.get_pheromone_check(c) > 0 and c.__str__() not in self.blocked:
+        for dx, dy in STEPS:
+            if self.tau[x + dx + 1, y + dy + 1] > 0 and not self.is_blocked(x + dx, y + dy):
                 ret += 1
         return ret
 
-    def calc_pheromone(self, i, s_pheromones):
-        euclid = self.euclid_to_goal(i)
-        return (s_pheromones.get(i) ** ALPHA) * (euclid ** BETA)
-
-    def euclid_to_goal(self, direction):
-        x, y = self.get_x_y_to_goal(direction)
-        return x ** 2 + y ** 2 if x ** 2 + y ** 2 != 0 else 1
-
-    def get_x_y_to_goal(self, i):
-        x = self.end.get_x() - self.current_position.add_direction(i).get_x()
-        y = self.end.get_y() - self.current_position.add_direction(i).get_y()
-        return x, y
+    # Lower bound on the amount of steps to the goal, from the BFS distance field when the maze has one cached.
+    # @param x x of the tile
+    # @param y y of the tile
+    # @return BFS distance, or the Manhattan distance without a field
+    def distance_to_goal(self, x, y):
+        if self.field is not None and self.field[x, y] >= 0:
+            return self.field[x, y]
+        return abs(self.end.get_x() - x) + abs(self.end.get_y() - y)
+
+    # Check whether an open tile is blocked for this ant, by itself or by the colony.
+    # @param x x of the tile
+    # @param y y of the tile
+    # @return whether the ant may not enter the tile
+    def is_blocked(self, x, y):
+        if self.blocked[x, y]:
+            return True
+        return self.dead_ends is not None and self.dead_ends[x, y] == 1
+
+    # Share a tile the ant backtracked from with the colony, if it is a dead end for every ant of this solve:
+    # it is not the start or end and at most one of its open neighbours is not a dead end itself.
+    # Tiles the ant blocked because of loops are not dead ends and are never shared.
+    # @param x x of the tile
+    # @param y y of the tile
+    def publish_dead_end(self, x, y):
+        if self.dead_ends is None or (x, y) == (self.start.get_x(), self.start.get_y()) \
+                or (x, y) == (self.end.get_x(), self.end.get_y()):
+            return
+        exits = 0
+        for dx, dy in STEPS:
+            if self.tau[x + dx + 1, y + dy + 1] > 0 and self.dead_ends[x + dx, y + dy] == 0:
+                exits += 1
+        if exits <= 1:
+            self.dead_ends[x, y] = 1
+
+    # Weight of a direction, pheromone of the next tile (or of the step when the maze keeps pheromone per direction)
+    # to the power ALPHA times the heuristic of the step.
+    # @param i the direction
+    # @param x x of the tile the ant is at
+    # @param y y of the tile the ant is at
+    # @return the weight, 0 when the next tile is not accessible
+    def calc_pheromone(self, i, x, y):
+        if self.tau_directions is not None:
+            return self.tau_directions[i.value, x, y] * self.eta[i.value, x, y]
+        dx, dy = STEPS[i.value]
+        return self.tau[x + 1 + dx, y + 1 + dy] * self.eta[i.value, x, y]
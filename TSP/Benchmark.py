@@ -0,0 +1,209 @@
+import contextlib
+import io
+import os, sys
+import pickle
+import random
+import statistics
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import src.AntColonyOptimization as colony
+from src.Ant import Ant
+from src.AntColonyOptimization import AntColonyOptimization, ANT_SYSTEM, ELITIST, RANK_BASED, MAX_MIN
+from src.Coordinate import Coordinate
+from src.Maze import Maze
+from src.PathSpecification import PathSpecification
+
+# Directory of the benchmark mazes, relative to the source directory like the other data files.
+BENCHMARK_DIR = "./../data/benchmark"
+# Benchmark mazes by name: width, length and the seed they are generated from.
+MAZES = {"small": (21, 21, 1), "medium": (41, 41, 2)}
+# Chance that a wall tile of a generated maze is opened, so the maze has loops and more than one route.
+EXTRA_OPENINGS = 0.1
+# Amount of seeded runs per configuration.
+SEEDS = 8
+
+
+# Generate a maze by a seeded depth first search, the start and end are in opposite corners.
+# @param width width of the maze, odd so the corridors end at the border
+# @param length length of the maze, odd so the corridors end at the border
+# @param seed seed of the generator, the same seed gives the same maze
+# @param extra chance that a wall tile is opened afterwards
+# @return the maze in the format of the maze files
+def generate_maze(width, length, seed, extra=EXTRA_OPENINGS):
+    rng = random.Random(seed)
+    walls = [[0] * length for _ in range(width)]
+    walls[0][0] = 1
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        steps = [(x + dx, y + dy, x + dx // 2, y + dy // 2) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                 if 0 <= x + dx < width and 0 <= y + dy < length and not walls[x + dx][y + dy]]
+        if not steps:
+            stack.pop()
+            continue
+        nx, ny, mx, my = rng.choice(steps)
+        walls[nx][ny] = 1
+        walls[mx][my] = 1
+        stack.append((nx, ny))
+    for x in range(width):
+        for y in range(length):
+            if not walls[x][y] and rng.random() < extra:
+                walls[x][y] = 1
+    lines = [str(width) + " " + str(length) + " "]
+    lines += [" ".join(str(walls[x][y]) for x in range(width)) + " " for y in range(length)]
+    return "\n".join(lines) + "\n"
+
+
+# Path of a benchmark maze, the maze is generated when the file does not exist yet.
+# @param name name of the maze in MAZES
+# @return path of the maze file
+def get_maze_file(name):
+    path = BENCHMARK_DIR + "/" + name + " maze.txt"
+    if not os.path.exists(path):
+        width, length, seed = MAZES[name]
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(generate_maze(width, length, seed))
+    return path
+
+
+# Read a benchmark maze with the route from its top left to its bottom right corner.
+# @param name name of the maze in MAZES
+# @return the maze, the path specification and the length of the shortest route
+def load_maze(name):
+    maze = Maze.create_maze(get_maze_file(name))
+    start, end = Coordinate(0, 0), Coordinate(maze.get_width() - 1, maze.get_length() - 1)
+    optimum = maze.get_shortest_route(start, end, maze.open_tiles).size()
+    return maze, PathSpecification(start, end), optimum
+
+
+# Solve without printing the progress of every generation.
+# @param aco the colony
+# @param path_specification Specification of the route we wish to optimize
+# @return the shortest route found
+def solve(aco, path_specification):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return aco.find_shortest_route(path_specification)
+
+
+# Generations the deposit strategies take to reach a target length: the optimum of the small maze and 10% above
+# the optimum of the medium maze. 10 ants, 80 generations, q=1000, rho=0.3.
+def bench_deposits():
+    for name, slack in (("small", 0), ("medium", 0.1)):
+        maze, spec, optimum = load_maze(name)
+        target = int(optimum * (1 + slack))
+        for deposit in (ANT_SYSTEM, ELITIST, RANK_BASED, MAX_MIN):
+            started = time.time()
+            reached = []
+            for seed in range(SEEDS):
+                aco = AntColonyOptimization(maze, 10, 80, 1000, 0.3, seed=seed, target_length=target,
+                                            deposit=deposit)
+                solve(aco, spec)
+                if aco.stop_reason == "target length":
+                    reached.append(aco.generations_run)
+            median = statistics.median(reached) if reached else None
+            print(name + ", target " + str(target) + ", " + deposit + ": reached " + str(len(reached)) + "/"
+                  + str(SEEDS) + ", median generations " + str(median) + ", generations " + str(reached)
+                  + ", time: " + str(round(time.time() - started, 1)))
+
+
+# Time of Route.shortcut on the route of a single ant on fresh pheromones, the routes with the most detours.
+def bench_shortcut():
+    for name in MAZES:
+        maze, spec, optimum = load_maze(name)
+        maze.reset()
+        times = []
+        for seed in range(SEEDS):
+            route = Ant(maze, spec, seed=seed).find_route()
+            started = time.perf_counter()
+            shortcut = route.shortcut(maze)
+            times.append((time.perf_counter() - started) * 1000)
+            print(name + ", seed " + str(seed) + ": " + str(route.size()) + " -> " + str(shortcut.size())
+                  + ", optimum " + str(optimum) + ", time: " + str(round(times[-1], 1)) + " ms")
+        print(name + ": median " + str(round(statistics.median(times), 1)) + " ms, max "
+              + str(round(max(times), 1)) + " ms")
+
+
+# Best route length with and without the exact search on the union of the walked tiles, 8 ants, 10 generations,
+# q=1000, rho=0.3 and no shortcuts, so the ants and the union search are measured on their own.
+def bench_union():
+    for name in MAZES:
+        maze, spec, optimum = load_maze(name)
+        for union in (None, 1, 3):
+            started = time.time()
+            sizes = []
+            for seed in range(SEEDS):
+                aco = AntColonyOptimization(maze, 8, 10, 1000, 0.3, seed=seed, shortcut_radius=None,
+                                            union_generations=union)
+                sizes.append(solve(aco, spec).size())
+            print(name + ", optimum " + str(optimum) + ", union_generations " + str(union) + ": median "
+                  + str(statistics.median(sizes)) + ", optimum reached " + str(sizes.count(optimum)) + "/"
+                  + str(SEEDS) + ", lengths " + str(sizes) + ", time: " + str(round(time.time() - started, 1)))
+
+
+# Finished and distinct routes per generation, the distinct ones are what the colony deposits, and the pickled state
+# of a route as the ant processes send it, against the state with the list of directions sent before.
+# 10 ants, 15 generations.
+def bench_duplicates():
+    for name in MAZES:
+        maze, spec, _ = load_maze(name)
+        for deposit in (ANT_SYSTEM, ELITIST):
+            done = distinct = 0
+            sent = listed = 0
+            for seed in range(SEEDS):
+                aco = AntColonyOptimization(maze, 10, 15, 1000, 0.3, seed=seed, deposit=deposit)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for _ in aco.iter_generations(spec):
+                        routes = [r for r in aco.routes if r.done]
+                        done += len(routes)
+                        distinct += len(set(routes))
+                        sent += sum(len(pickle.dumps(r.__getstate__())) for r in routes)
+                        listed += sum(len(pickle.dumps(get_listed_state(r))) for r in routes)
+            print(name + ", " + deposit + ": finished routes " + str(done) + ", distinct " + str(distinct)
+                  + ", bytes per route " + str(round(sent / done)) + ", with a list of directions "
+                  + str(round(listed / done)))
+
+
+# State of a route as it was pickled before the directions were packed.
+# @param route the route
+# @return the attributes with the directions as a list
+def get_listed_state(route):
+    state = {key: value for key, value in vars(route).items() if key not in ("hashes", "packed_hash")}
+    state["route"] = list(route.get_route())
+    return state
+
+
+# Steps a successful ant takes with pheromone per tile and per direction, and the best route length. 10 ants,
+# 15 generations and a fixed step budget, so the ants are not cut short by a budget learnt from earlier ants.
+def bench_directions():
+    for name in MAZES:
+        maze, spec, optimum = load_maze(name)
+        for directions in (False, True):
+            for deposit in (ANT_SYSTEM, MAX_MIN):
+                started = time.time()
+                steps = []
+                sizes = []
+                for seed in range(SEEDS):
+                    aco = AntColonyOptimization(maze, 10, 15, 1000, 0.3, seed=seed, deposit=deposit,
+                                                adaptive_budget=False, direction_pheromones=directions)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        for stats in aco.iter_generations(spec):
+                            steps += [r.steps for r in aco.routes if r.done]
+                    sizes.append(stats.get_best_route().size())
+                print(name + ", " + ("directions" if directions else "tiles") + ", " + deposit
+                      + ": mean steps per successful ant " + str(round(statistics.mean(steps)))
+                      + ", median best " + str(statistics.median(sizes)) + " (optimum " + str(optimum)
+                      + "), time: " + str(round(time.time() - started, 1)))
+
+
+BENCHMARKS = {"deposits": bench_deposits, "shortcut": bench_shortcut, "union": bench_union,
+              "duplicates": bench_duplicates, "directions": bench_directions}
+
+# Driver function for the benchmarks, runs the benchmarks named as arguments or all of them.
+if __name__ == "__main__":
+    # the ants run in this process, so the timings do not include forking
+    colony.THREADING = False
+    for benchmark in sys.argv[1:] or BENCHMARKS:
+        print("== " + benchmark)
+        BENCHMARKS[benchmark]()
@@ -3,6 +3,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 import random
 from src.TSPData import TSPData
+from src.TourBounds import TourBounds
+from src.FitnessCache import FitnessCache, CACHE_SIZE
+
+# crossover probability
+PC = 0.7
+# mutation probability per product
+PM = 0.01
 
 # TSP problem solver using genetic algorithms.
 class GeneticAlgorithm:
@@ -10,9 +17,14 @@ class GeneticAlgorithm:
     # Constructs a new 'genetic algorithm' object.
     # @param generations the amount of generations.
     # @param popSize the population size.
-    def __init__(self, generations, pop_size):
+    # @param max_gap stop as soon as the best tour is within this relative gap of the lower bound (None runs all generations).
+    # @param cache_size maximum amount of evaluated tours that are remembered.
+    def __init__(self, generations, pop_size, max_gap=None, cache_size=CACHE_SIZE):
         self.generations = generations
         self.pop_size = pop_size
+        self.max_gap = max_gap
+        self.cache = FitnessCache(cache_size)
+        self.generations_run = 0
 
      # Knuth-Yates shuffle, reordering an array randomly
      # @param chromosome array to shuffle.
@@ -25,109 +37,90 @@ class GeneticAlgorithm:
             chromosome[i] = swap
         return chromosome
 
-    # Fitness function
-    def fitness_function(self, distance, distances):
-        fitness = sys.maxsize
-        for dist in distances:
-            if dist < distance and dist != distance:
-                fitness = dist
-        return fitness
-
-    # Crossover
-    def crossover(self, crossover_pt, pair_cs):
-        if pair_cs[0] < pair_cs[1]:
-            shift = crossover_pt * pair_cs[1]
-            pair_cs[1] -= shift
-            pair_cs[0] += shift
-        else:
-            shift = crossover_pt * pair_cs[0]
-            pair_cs[0] -= shift
-            pair_cs[1] += shift
-        return pair_cs
-
-    # Mutation
+    # Fitness function, shorter tours are fitter
+    # @param length length of the tour of a product order.
+    # @return fitness of the product order
+    def fitness_function(self, length):
+        return 1 / (length + 1)
+
+    # Roulette wheel selection of a single parent
+    # @param chromosomes population
+    # @param cumulative_fitness cumulative fitness of the population
+    # @return selected chromosome
+    def select(self, chromosomes, cumulative_fitness):
+        pick = random.uniform(0, cumulative_fitness[-1])
+        return chromosomes[min(int(np.searchsorted(cumulative_fitness, pick)), len(chromosomes) - 1)]
+
+    # Order crossover, keeps a slice of the first parent and fills in the rest in the order of the second parent
+    # @param parent_a first parent
+    # @param parent_b second parent
+    # @return the child
+    def crossover(self, parent_a, parent_b):
+        n = len(parent_a)
+        lo, hi = sorted(random.sample(range(n + 1), 2))
+        middle = parent_a[lo:hi]
+        taken = set(middle)
+        rest = [gene for gene in parent_b if gene not in taken]
+        return rest[:lo] + middle + rest[lo:]
+
+    # Swap mutation
+    # @param chromosome product order to mutate
+    # @return the mutated product order
     def mutation(self, chromosome):
-        bit_str = bin(chromosome)
-
-        if bit_str[len(bit_str) - 1] == '0':
-            bit_str[len(bit_str) - 1] = '1'
-        else:
-            bit_str[len(bit_str) - 1] = '0'
-
-        mut_cs = int (bit_str, 2)
-        return mut_cs
+        for i in range(len(chromosome)):
+            if random.uniform(0, 1) < PM:
+                j = random.randint(0, len(chromosome) - 1)
+                chromosome[i], chromosome[j] = chromosome[j], chromosome[i]
+        return chromosome
 
     # This method should solve the TSP.
     # @param pd the TSP data.
     # @return the optimized product sequence.
     def solve_tsp(self, tsp_data: TSPData):
-        # list = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 16, 17]
-
-        # Get the list of distances
-        # [ [ {0,0}.size  {0,1}.size  ... ] , [  {1,0}.size  ... ],   ...]
-        distances = tsp_data.get_distances()
+        number_of_products = len(tsp_data.get_distances())
+        bounds = TourBounds(tsp_data) if self.max_gap is not None else None
+        self.cache.clear()
 
         # Pick the initial sample of chromosomes
-        chromosomes = []
-
-        random_indices = [random.randint(0, len(distances) - 1) for _ in range(18)]
-        for random_index in random_indices:
-            random_ind = random.randint(0, len(distances[random_index]) - 1)
-            chromosomes.append(distances[random_index][random_ind])
-
-        # Shuffle them randomly
-        self.shuffle(chromosomes)
-
-        # Find fitness for each chromosome
-        fitness_cs = []
-        for chromosome in chromosomes:
-            fitness_c = self.fitness_function(chromosome, chromosomes)
-            fitness_cs.append(fitness_c)
-
-        # Find fitness ratios
-        fitness_ratios = []
-        sum_fitness_cs = np.sum(fitness_cs)
-        for fitness_c in fitness_cs:
-            fitness_ratios.append(fitness_c / sum_fitness_cs * 100)
-
-        # Cumulative fitness ratio
-        cumulative_fitness = []
-        for i in range(0, len(fitness_ratios) - 1):
-            cumulative_fitness.append(fitness_ratios[i] + np.sum(fitness_ratios[0:i]))
-
-        # Roulette wheel selection
-        pair_cs = []
-        random_nos = [random.randint(0, np.argmax(cumulative_fitness)) for _ in range(2)]
-        for i in range(0, len(cumulative_fitness)):
-            count = 0
-            if i != len(cumulative_fitness) and count < 2:
-                if np.abs(cumulative_fitness[i] - cumulative_fitness[i + 1]) < random_nos[i]:
-                    pair_cs.append(chromosomes[i])
-                    count += 1
-
-        # Crossover
-        pc = 0.7
-        crossover_pt = random.randint(0, 100) / 100
-        if crossover_pt < pc:
-            new_pair_cs = self.crossover(crossover_pt, pair_cs)
-        else:
-            new_pair_cs = pair_cs
-
-        # Update chromosomes
-        for parent in pair_cs:
-            chromosomes.remove(parent)
-        for new_parent in new_pair_cs:
-            chromosomes.append(new_parent)
-
-        # Mutation
-        pm = 0.01
-        rand = random.randint(0, 100) / 100
-        for chromosome in chromosomes:
-            if rand <= pm:
-                chromosomes.remove(chromosome)
-                chromosomes.append(self.mutation(chromosome))
-
-        return chromosomes
+        chromosomes = [self.shuffle(list(range(number_of_products))) for _ in range(self.pop_size)]
+
+        best = None
+        best_length = sys.maxsize
+        elite_length = None
+        self.generations_run = 0
+        for gen in range(self.generations):
+            self.generations_run = gen + 1
+
+            # Find fitness for each chromosome, the elite of the previous generation is the first chromosome and
+            # keeps its length, so the cache statistics only count new individuals
+            carried = [] if elite_length is None else [elite_length]
+            lengths = carried + [self.cache.get_tour_length(tsp_data, chromosome)
+                                 for chromosome in chromosomes[len(carried):]]
+            fitness_cs = [self.fitness_function(length) for length in lengths]
+            elite_i = int(np.argmax(fitness_cs))
+            elite = chromosomes[elite_i]
+            elite_length = lengths[elite_i]
+            if elite_length < best_length:
+                best = list(elite)
+                best_length = elite_length
+
+            if bounds is not None and bounds.within_gap(best_length, self.max_gap):
+                break
+
+            # Roulette wheel selection, crossover and mutation, the best chromosome survives unchanged
+            cumulative_fitness = np.cumsum(fitness_cs)
+            new_chromosomes = [list(elite)]
+            while len(new_chromosomes) < self.pop_size:
+                parent_a = self.select(chromosomes, cumulative_fitness)
+                parent_b = self.select(chromosomes, cumulative_fitness)
+                if random.uniform(0, 1) < PC:
+                    child = self.crossover(parent_a, parent_b)
+                else:
+                    child = list(parent_a)
+                new_chromosomes.append(self.mutation(child))
+            chromosomes = new_chromosomes
+
+        return best
 
 # Assignment 2.b
 if __name__ == "__main__":
@@ -143,5 +136,6 @@ if __name__ == "__main__":
     # run optimzation and write to file
     solution = ga.solve_tsp(tsp_data)
     tsp_data.write_action_file(solution, "./../data/easy_solution.txt")
+    print("Fitness cache: " + str(ga.cache))
 
-    distances = tsp_data.get_distances()
\ No newline at end of file
+    distances = tsp_data.get_distances()
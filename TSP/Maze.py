@@ -1,14 +1,21 @@
+import hashlib
 import os, sys
-from typing import Dict
+import numpy as np
 
-from src.Route import Route
+from src.Route import Route, DELTAS
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 import traceback
+from collections import OrderedDict
 from src.Coordinate import Coordinate
 from src.Direction import Direction
 from src.SurroundingPheromone import SurroundingPheromone
+from src.Heuristic import BFS
+from src.JunctionGraph import JunctionGraph
+
+# Amount of distance fields and heuristic tables kept before the least recently used one is evicted.
+FIELD_CACHE_SIZE = 32
 
 
 # Class that holds all the maze data. This means the pheromones, the open and blocked tiles in the system as
@@ -25,24 +32,105 @@ class Maze:
         self.width = width
         self.start = None
         self.end = None
-        self.maze_pheromones: Dict[(int, int), float] = dict()
+        self.open_tiles = np.array(walls, dtype=bool).reshape(width, length)
+        self.maze_pheromones = np.zeros((width, length))
+        self.pheromone_power = None
+        # optional pheromone per outgoing direction of every tile, 4 x width x length indexed by direction value
+        self.direction_pheromones = None
+        self.direction_pheromone_power = None
+        self.valid_steps = None
+        self.walls_hash = None
+        self.distance_fields = OrderedDict()
+        self.heuristic_tables = OrderedDict()
+        self.pruned_mazes = OrderedDict()
+        self.junction_graphs = OrderedDict()
+        self.protected = None
         self.initialize_pheromones()
 
     # Initialize pheromones to a start value.
     def initialize_pheromones(self):
-        self.maze_pheromones = dict()
-
-        for x in range(0, self.width):
-            for y in range(0, self.length):
-                if self.walls[x][y] == 1:
-                    self.maze_pheromones[(x, y)] = 1
+        self.set_pheromone_grid(np.ones((self.width, self.length)))
 
     # Reset the maze for a new shortest path problem.
     def reset(self):
         self.initialize_pheromones()
 
+    # Switch between pheromone per tile and pheromone per outgoing direction of every tile. With directions, the
+    # pheromone grid of the tiles is derived from the directions (the mean of the directions leading into a tile)
+    # and a grid that is set gives every direction the pheromone of the tile it leads to.
+    # @param enabled whether to keep pheromone per direction
+    def set_direction_pheromones(self, enabled):
+        if enabled == (self.direction_pheromones is not None):
+            return
+        if enabled:
+            self.direction_pheromones = np.zeros((4, self.width, self.length))
+            self.set_pheromone_grid(self.maze_pheromones)
+        else:
+            self.direction_pheromones = None
+            self.direction_pheromone_power = None
+
+    # Steps between two accessible tiles, 4 x width x length indexed by direction value.
+    # @return bool array
+    def get_valid_steps(self):
+        if self.valid_steps is None:
+            self.valid_steps = self.shift_to_source(np.broadcast_to(self.open_tiles, (4, self.width, self.length)))
+            self.valid_steps &= self.open_tiles
+        return self.valid_steps
+
+    # For every tile and direction, the value of the tile the direction leads to (0 outside the maze).
+    # @param grid 4 x width x length array, channel d is read at the tiles direction d leads to
+    # @return 4 x width x length array
+    def shift_to_source(self, grid):
+        padded = np.zeros((4, self.width + 2, self.length + 2), dtype=grid.dtype)
+        padded[:, 1:-1, 1:-1] = grid
+        shifted = np.empty((4, self.width, self.length), dtype=grid.dtype)
+        for d, (dx, dy) in enumerate(DELTAS.tolist()):
+            shifted[d] = padded[d, 1 + dx:self.width + 1 + dx, 1 + dy:self.length + 1 + dy]
+        return shifted
+
+    # For every tile and direction, the value of the step in that direction that leads into the tile.
+    # @param grid 4 x width x length array of values per step
+    # @return 4 x width x length array
+    def shift_to_target(self, grid):
+        padded = np.zeros((4, self.width + 2, self.length + 2), dtype=grid.dtype)
+        for d, (dx, dy) in enumerate(DELTAS.tolist()):
+            padded[d, 1 + dx:self.width + 1 + dx, 1 + dy:self.length + 1 + dy] = grid[d]
+        return padded[:, 1:-1, 1:-1]
+
+    # Derive the pheromone of the tiles from the pheromone of the directions leading into them. Tiles that
+    # cannot be entered keep 1, so every accessible tile keeps a positive pheromone.
+    def update_tile_pheromones(self):
+        incoming = self.shift_to_target(self.direction_pheromones)
+        count = self.shift_to_target(self.get_valid_steps().astype(np.int8)).sum(axis=0)
+        mean = incoming.sum(axis=0) / np.maximum(count, 1)
+        self.maze_pheromones = np.where(self.open_tiles, np.where(count > 0, mean, 1.0), 0.0)
+        self.pheromone_power = None
+        self.direction_pheromone_power = None
+
+    # Average lambda-branching factor over the junctions of the maze, the tiles with at least three open neighbours.
+    # For every junction the steps with pheromone of at least min + lam * (max - min) over its steps are counted, a
+    # step weighs the pheromone of its direction or, per tile, of the tile it leads to. Unexplored junctions keep
+    # all their steps. Per tile both the tile before and after a junction on a route carry its pheromone, so a colony
+    # that settled on its routes approaches 2, with pheromone per direction it approaches 1.
+    # @param lam relative threshold
+    # @return the average branching factor, 1 for a maze without junctions
+    def get_branching_factor(self, lam):
+        steps = self.get_valid_steps()
+        junctions = steps.sum(axis=0) >= 3
+        if not junctions.any():
+            return 1.0
+        if self.direction_pheromones is not None:
+            levels = self.direction_pheromones[:, junctions]
+        else:
+            levels = self.shift_to_source(np.broadcast_to(self.maze_pheromones, steps.shape))[:, junctions]
+        valid = steps[:, junctions]
+        low = np.where(valid, levels, np.inf).min(axis=0)
+        high = np.where(valid, levels, -np.inf).max(axis=0)
+        return float((valid & (levels >= low + lam * (high - low))).sum(axis=0).mean())
+
     def remove_pheromone(self, cord: Coordinate, mod=0.5):
-        self.maze_pheromones[(cord.get_x(), cord.get_y())] = self.maze_pheromones[(cord.get_x(), cord.get_y())] * mod
+        self.maze_pheromones[cord.get_x(), cord.get_y()] *= mod
+        self.pheromone_power = None
 
     # Update the pheromones along a certain route according to a certain Q
     # @param r The route of the ants
@@ -50,31 +138,317 @@ class Maze:
     def add_pheromone_route(self, route, q):
         deltaTau = q / route.size()
 
-        start = route.get_start()
-        cur: Coordinate = start
-        seen = []
-        for d in route.get_route():
-            if cur not in seen:
-                curTau = self.get_pheromone(cur)
-                self.maze_pheromones[(cur.get_x(), cur.get_y())] = curTau + deltaTau
-                seen.append(cur)
+        # every cell the route leaves gets pheromone once, the final cell gets none
+        cells = np.unique(route.get_cells()[:-1], axis=0)
+        self.maze_pheromones[cells[:, 0], cells[:, 1]] += deltaTau
+        self.pheromone_power = None
 
-            cur = cur.add_direction(d)
-
-    # Update pheromones for a list of routes
+    # Update pheromones for a list of routes, all deposits are summed in a single pass over the grid.
     # @param routes A list of routes
     # @param Q Normalization factor for amount of dropped pheromone
-    def add_pheromone_routes(self, routes, q):
+    # @param weights weight of the deposit of every route (None deposits every route once)
+    def add_pheromone_routes(self, routes, q, weights=None):
+        cells = []
+        amounts = []
         r: Route
-        for r in routes:
-            if r.done:
-                self.add_pheromone_route(r, q)
+        for i, r in enumerate(routes):
+            if r.done and r.size() > 0:
+                # every cell the route leaves gets pheromone once, the final cell gets none
+                route_cells = r.get_cells()[:-1]
+                ids = route_cells[:, 0] * self.length + route_cells[:, 1]
+                if self.direction_pheromones is not None:
+                    # with directions, the step the route takes out of the cell gets the pheromone
+                    values = np.fromiter((d.value for d in r.get_route()), dtype=np.int64, count=r.size())
+                    ids = values * self.maze_pheromones.size + ids
+                ids = np.unique(ids)
+                cells.append(ids)
+                amounts.append(np.full(len(ids), q * (1 if weights is None else weights[i]) / r.size()))
+        if not cells:
+            return
+        if self.direction_pheromones is not None:
+            deposit = np.bincount(np.concatenate(cells), np.concatenate(amounts),
+                                  minlength=self.direction_pheromones.size)
+            self.direction_pheromones += deposit.reshape(self.direction_pheromones.shape)
+            self.update_tile_pheromones()
+            return
+        deposit = np.bincount(np.concatenate(cells), np.concatenate(amounts), minlength=self.maze_pheromones.size)
+        self.maze_pheromones += deposit.reshape(self.maze_pheromones.shape)
+        self.pheromone_power = None
+
+    # Keep the pheromones of all accessible tiles within bounds
+    # @param low lower bound
+    # @param high upper bound
+    def clip_pheromones(self, low, high):
+        if self.direction_pheromones is not None:
+            clipped = np.clip(self.direction_pheromones, low, high)
+            self.direction_pheromones = np.where(self.get_valid_steps(), clipped, 0.0)
+            self.update_tile_pheromones()
+            return
+        self.maze_pheromones = np.where(self.open_tiles, np.clip(self.maze_pheromones, low, high), 0.0)
+        self.pheromone_power = None
 
     # Evaporate pheromone
     # @param rho evaporation factor
     def evaporate(self, rho):
-        for key, value in self.maze_pheromones.items():
-            self.maze_pheromones[key] = (1 - rho) * value
+        if self.direction_pheromones is not None:
+            self.direction_pheromones *= 1 - rho
+            self.update_tile_pheromones()
+            return
+        self.maze_pheromones *= 1 - rho
+        self.pheromone_power = None
+
+    # Pheromones as a width x length grid, 0 on walls.
+    # @return numpy array of pheromones
+    def get_pheromone_grid(self):
+        return self.maze_pheromones.copy()
+
+    # Replace the pheromones of all accessible tiles by the values of a grid.
+    # @param grid width x length array of pheromones
+    def set_pheromone_grid(self, grid):
+        self.maze_pheromones = np.where(self.open_tiles, grid, 0.0)
+        self.pheromone_power = None
+        if self.direction_pheromones is not None:
+            targets = self.shift_to_source(np.broadcast_to(self.maze_pheromones, (4, self.width, self.length)))
+            self.direction_pheromones = np.where(self.get_valid_steps(), targets, 0.0)
+            self.direction_pheromone_power = None
+
+    # Copy of all pheromones: the tile grid and, when kept, the pheromone per direction. Unlike the pheromone grid,
+    # it restores the directions exactly, so a solve can keep one pheromone state per colony on the same maze.
+    # @return tuple of the width x length grid and the 4 x width x length directions (None without directions)
+    def get_pheromone_state(self):
+        directions = None if self.direction_pheromones is None else self.direction_pheromones.copy()
+        return self.maze_pheromones.copy(), directions
+
+    # Restore pheromones copied by get_pheromone_state.
+    # @param state tuple of the tile grid and the directions
+    def set_pheromone_state(self, state):
+        grid, directions = state
+        if directions is None or self.direction_pheromones is None:
+            self.set_pheromone_grid(grid)
+            return
+        self.maze_pheromones = grid.copy()
+        self.direction_pheromones = directions.copy()
+        self.pheromone_power = None
+        self.direction_pheromone_power = None
+
+    # Pheromones per direction raised to the power alpha, computed once per pheromone update and shared by all ants.
+    # @param alpha the exponent
+    # @return 4 x width x length array indexed by direction value, None without pheromone per direction
+    def get_direction_pheromone_power(self, alpha):
+        if self.direction_pheromones is None:
+            return None
+        if self.direction_pheromone_power is None or self.direction_pheromone_power[0] != alpha:
+            power = self.direction_pheromones if alpha == 1 else self.direction_pheromones ** alpha
+            self.direction_pheromone_power = (alpha, power)
+        return self.direction_pheromone_power[1]
+
+    # Pheromones raised to the power alpha, padded with a border of 0's so the neighbours of every tile can be read
+    # without bounds checks (tile x, y is at x + 1, y + 1). Computed once per pheromone update and shared by all ants.
+    # @param alpha the exponent
+    # @return (width + 2) x (length + 2) array
+    def get_pheromone_power(self, alpha):
+        if self.pheromone_power is None or self.pheromone_power[0] != alpha:
+            padded = np.zeros((self.width + 2, self.length + 2))
+            padded[1:-1, 1:-1] = self.maze_pheromones if alpha == 1 else self.maze_pheromones ** alpha
+            self.pheromone_power = (alpha, padded)
+        return self.pheromone_power[1]
+
+    # Hash of the layout of the maze, identifies mazes with the same walls.
+    # @return hex digest of the walls
+    def get_hash(self):
+        if self.walls_hash is None:
+            walls = np.array(self.walls, dtype=np.uint8)
+            self.walls_hash = hashlib.sha1(walls.tobytes() + str(walls.shape).encode()).hexdigest()
+        return self.walls_hash
+
+    # Geodesic distance from every tile to a target, computed once per target with a breadth first search
+    # that expands the whole frontier at once. Fields are cached and shared by all ants and solves towards the target.
+    # @param end the target coordinate
+    # @return width x length int array of distances, -1 on walls and unreachable tiles
+    def get_distance_field(self, end):
+        key = (end.get_x(), end.get_y())
+        field = self.distance_fields.get(key)
+        if field is not None:
+            self.distance_fields.move_to_end(key)
+            return field
+
+        field = self.compute_distance_field(end, self.open_tiles)
+        self.distance_fields[key] = field
+        if len(self.distance_fields) > FIELD_CACHE_SIZE:
+            self.distance_fields.popitem(last=False)
+        return field
+
+    # Breadth first search from a target over a set of tiles, expanding the whole frontier at once.
+    # @param end the target coordinate
+    # @param tiles width x length bool array of the tiles the search may use
+    # @return width x length int array of distances, -1 outside tiles and on unreachable tiles
+    def compute_distance_field(self, end, tiles):
+        key = (end.get_x(), end.get_y())
+        field = np.full((self.width, self.length), -1, dtype=np.int32)
+        frontier = np.zeros_like(tiles)
+        if self.in_bounds(end) and tiles[key]:
+            frontier[key] = True
+        distance = 0
+        while frontier.any():
+            field[frontier] = distance
+            reached = np.zeros_like(frontier)
+            reached[1:, :] |= frontier[:-1, :]
+            reached[:-1, :] |= frontier[1:, :]
+            reached[:, 1:] |= frontier[:, :-1]
+            reached[:, :-1] |= frontier[:, 1:]
+            frontier = reached & tiles & (field < 0)
+            distance += 1
+        return field
+
+    # Exact shortest route between two tiles that only uses a given set of tiles, e.g. the tiles the ants walked.
+    # @param start the starting coordinate
+    # @param end the target coordinate
+    # @param tiles width x length bool array of the tiles the route may use
+    # @return the finished route, or None when end cannot be reached from start within the tiles
+    def get_shortest_route(self, start, end, tiles):
+        field = self.compute_distance_field(end, tiles & self.open_tiles)
+        x, y = start.get_x(), start.get_y()
+        if not self.in_bounds(start) or field[x, y] < 0:
+            return None
+        route = Route(start)
+        route.end = end
+        route.done = True
+        while field[x, y] > 0:
+            for direction in Direction:
+                dx, dy = DELTAS[direction.value]
+                nx, ny = x + int(dx), y + int(dy)
+                if self.in_bounds_xy(nx, ny) and field[nx, ny] == field[x, y] - 1:
+                    route.add(direction)
+                    x, y = nx, ny
+                    break
+        return route
+
+    # Breadth first search of at most radius steps from a tile, for local improvements of routes.
+    # @param x x of the tile
+    # @param y y of the tile
+    # @param radius maximum amount of steps
+    # @return dict from every reached tile to its distance and dict from every reached tile to the direction that
+    # leads into it on a shortest path
+    def local_search(self, x, y, radius):
+        distance = {(x, y): 0}
+        parent = dict()
+        frontier = [(x, y)]
+        for d in range(1, radius + 1):
+            reached = []
+            for cx, cy in frontier:
+                for direction in Direction:
+                    dx, dy = DELTAS[direction.value]
+                    nx, ny = cx + int(dx), cy + int(dy)
+                    if (nx, ny) in distance or not self.in_bounds_xy(nx, ny) or not self.open_tiles[nx, ny]:
+                        continue
+                    distance[(nx, ny)] = d
+                    parent[(nx, ny)] = direction
+                    reached.append((nx, ny))
+            frontier = reached
+        return distance, parent
+
+    # Maze with all dead ends filled in. Tiles with at most one accessible neighbour are closed repeatedly until
+    # none are left, except for the protected tiles (start, end and product locations) which must stay reachable.
+    # The pruned maze is cached per set of protected tiles.
+    # @param protected coordinates that must stay open
+    # @return a new Maze without dead ends
+    def get_pruned(self, protected):
+        key = frozenset((c.get_x(), c.get_y()) for c in protected)
+        pruned = self.pruned_mazes.get(key)
+        if pruned is not None:
+            self.pruned_mazes.move_to_end(key)
+            return pruned
+
+        keep = np.zeros((self.width, self.length), dtype=bool)
+        for x, y in key:
+            if 0 <= x < self.width and 0 <= y < self.length:
+                keep[x, y] = True
+        open_tiles = self.open_tiles.copy()
+        while True:
+            padded = np.pad(open_tiles, 1).astype(np.int8)
+            neighbours = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+            dead = open_tiles & (neighbours <= 1) & ~keep
+            if not dead.any():
+                break
+            open_tiles &= ~dead
+
+        pruned = Maze(open_tiles.astype(int).tolist(), self.width, self.length)
+        pruned.protected = key
+        print("Pruned " + str(int(self.open_tiles.sum() - open_tiles.sum())) + " dead end tiles")
+        self.pruned_mazes[key] = pruned
+        if len(self.pruned_mazes) > FIELD_CACHE_SIZE:
+            self.pruned_mazes.popitem(last=False)
+        return pruned
+
+    # Junction graph of the maze with the given coordinates as extra nodes, cached per set of coordinates.
+    # @param endpoints coordinates that must be nodes of the graph
+    # @return the JunctionGraph
+    def get_junction_graph(self, endpoints):
+        key = frozenset((c.get_x(), c.get_y()) for c in endpoints)
+        graph = self.junction_graphs.get(key)
+        if graph is not None:
+            self.junction_graphs.move_to_end(key)
+            return graph
+
+        graph = JunctionGraph(self, endpoints)
+        self.junction_graphs[key] = graph
+        if len(self.junction_graphs) > FIELD_CACHE_SIZE:
+            self.junction_graphs.popitem(last=False)
+        return graph
+
+    # Check whether the maze was pruned with all given coordinates protected.
+    # @param coordinates coordinates to check
+    # @return whether the coordinates were protected
+    def protects(self, coordinates):
+        return self.protected is not None and all((c.get_x(), c.get_y()) in self.protected for c in coordinates)
+
+    # Distance field of a target if it was computed before, without computing it.
+    # @param end the target coordinate
+    # @return the distance field or None
+    def peek_distance_field(self, end):
+        return self.distance_fields.get((end.get_x(), end.get_y()))
+
+    # Heuristic weight of every step towards a target, computed once per target and heuristic.
+    # Entry [d, x, y] is the weight of moving from x, y in the direction with value d, 0 when that tile is not
+    # accessible. With the EUCLID heuristic it is the squared distance of the new tile to the target to the power beta,
+    # with the BFS heuristic 2 ** (beta * (distance here - distance there)) on the distance field of the target.
+    # @param end the target coordinate
+    # @param heuristic EUCLID or BFS
+    # @param beta exponent of the heuristic, see Ant.heuristic_beta
+    # @return 4 x width x length array of weights
+    def get_heuristic_table(self, end, heuristic, beta):
+        key = (end.get_x(), end.get_y(), heuristic, beta)
+        table = self.heuristic_tables.get(key)
+        if table is not None:
+            self.heuristic_tables.move_to_end(key)
+            return table
+
+        xs, ys = np.meshgrid(np.arange(self.width), np.arange(self.length), indexing="ij")
+        padded_open = np.zeros((self.width + 2, self.length + 2), dtype=bool)
+        padded_open[1:-1, 1:-1] = self.open_tiles
+        if heuristic == BFS:
+            field = self.get_distance_field(end)
+            padded_field = np.full((self.width + 2, self.length + 2), -1)
+            padded_field[1:-1, 1:-1] = field
+
+        table = np.zeros((4, self.width, self.length))
+        for d in Direction:
+            dx, dy = DELTAS[d.value]
+            accessible = padded_open[xs + 1 + dx, ys + 1 + dy]
+            if heuristic == BFS:
+                there = padded_field[xs + 1 + dx, ys + 1 + dy]
+                accessible &= (there >= 0) & (field >= 0)
+                # neighbours on the field differ by at most one step, masking first keeps the power finite
+                weight = 2.0 ** (beta * np.where(accessible, field - there, 0))
+            else:
+                squared = (end.get_x() - xs - dx) ** 2 + (end.get_y() - ys - dy) ** 2
+                weight = np.where(squared != 0, squared, 1) ** beta
+            table[d.value] = np.where(accessible, weight, 0.0)
+
+        self.heuristic_tables[key] = table
+        if len(self.heuristic_tables) > FIELD_CACHE_SIZE:
+            self.heuristic_tables.popitem(last=False)
+        return table
 
     # Width getter
     # @return width of the maze
@@ -90,6 +464,11 @@ class Maze:
     # @param position The position to check the neighbours of.
     # @return the pheromones of the neighbouring positions.
     def get_surrounding_pheromone(self, position: Coordinate) -> SurroundingPheromone:
+        if self.direction_pheromones is not None and self.in_bounds(position):
+            # the pheromone of the steps out of the tile
+            channels = self.direction_pheromones[:, position.get_x(), position.get_y()]
+            return SurroundingPheromone(channels[Direction.north.value], channels[Direction.east.value],
+                                        channels[Direction.south.value], channels[Direction.west.value])
         n = self.get_pheromone_check(position.add_direction(Direction.north))
         e = self.get_pheromone_check(position.add_direction(Direction.east))
         s = self.get_pheromone_check(position.add_direction(Direction.south))
@@ -98,7 +477,7 @@ class Maze:
         return SurroundingPheromone(n, e, s, w)
 
     def get_pheromone_check(self, pos):
-        if (pos.get_x(), pos.get_y()) in self.maze_pheromones:
+        if self.in_bounds(pos):
             return self.get_pheromone(pos)
         else:
             return 0
@@ -107,7 +486,7 @@ class Maze:
     # @param pos Position coordinate
     # @return pheromone at point
     def get_pheromone(self, pos):
-        return self.maze_pheromones[(pos.get_x(), pos.get_y())]
+        return self.maze_pheromones[pos.get_x(), pos.get_y()]
 
     # Check whether a coordinate lies in the current maze.
     # @param position The position to be checked
@@ -115,6 +494,13 @@ class Maze:
     def in_bounds(self, position):
         return position.x_between(0, self.width) and position.y_between(0, self.length)
 
+    # Check whether a position given by its x and y lies in the current maze.
+    # @param x the x position
+    # @param y the y position
+    # @return Whether the position is in the current maze
+    def in_bounds_xy(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.length
+
     # Representation of Maze as defined by the input file format.
     # @return String representation
     def __str__(self):
@@ -160,6 +546,9 @@ class Maze:
             traceback.print_exc()
             sys.exit()
 
+    # Write the pheromones to a tab separated file, tiles blocked by an ant are written as 0.
+    # @param file_path path to the file
+    # @param b width x length array of the tiles blocked by the ant
     def write_to_file(self, file_path, b):
         f = open(file_path, "w")
         string = ""
@@ -168,7 +557,7 @@ class Maze:
             for y in range(0, self.width):
                 c = Coordinate(y, x)
                 o = self.get_pheromone_check(c)
-                if c.__str__() in b:
+                if b[c.get_x(), c.get_y()]:
                     o = 0
                 string += str(o) + "\t"
             string += "\n"
@@ -0,0 +1,81 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Default amount of pheromone snapshots kept in the cache.
+CACHE_SIZE = 32
+# Targets within this Manhattan distance are used to warm start a solve towards a new target.
+RADIUS = 10
+# Weight of the snapshot in the warm start, the rest is the uniform start value of 1.
+WEIGHT = 0.5
+
+
+# Least recently used cache of compressed pheromone grids, keyed by maze and target coordinate.
+# A new solve towards the same or a nearby target starts from a blend of the cached grids instead of uniform 1's.
+class PheromoneCache:
+
+    # Constructs a new cache.
+    # @param max_size maximum amount of snapshots kept before the least recently used one is evicted.
+    # @param radius maximum Manhattan distance between targets for a snapshot to be reused.
+    # @param weight weight of the snapshot compared to the uniform start value.
+    def __init__(self, max_size=CACHE_SIZE, radius=RADIUS, weight=WEIGHT):
+        self.max_size = max_size
+        self.radius = radius
+        self.weight = weight
+        self.snapshots = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Store the pheromones of a maze after a solve towards a target.
+    # @param maze the maze with the learned pheromones
+    # @param end the target coordinate of the solve
+    def store(self, maze, end):
+        grid = maze.get_pheromone_grid().astype(np.float32)
+        key = (maze.get_hash(), end.get_x(), end.get_y())
+        self.snapshots[key] = (grid.shape, zlib.compress(grid.tobytes(), 1))
+        self.snapshots.move_to_end(key)
+        if len(self.snapshots) > self.max_size:
+            self.snapshots.popitem(last=False)
+
+    # Warm start grid for a solve towards a target, blended from the snapshots of the target and nearby targets.
+    # Every snapshot is normalized to a mean of 1 over the accessible tiles before blending.
+    # @param maze the maze to solve in
+    # @param end the target coordinate of the solve
+    # @return width x length array of pheromones, or None when there is no usable snapshot
+    def lookup(self, maze, end):
+        maze_hash = maze.get_hash()
+        blend = None
+        total_weight = 0
+        closest_weight = 0
+        for key, (shape, data) in list(self.snapshots.items()):
+            h, x, y = key
+            distance = abs(x - end.get_x()) + abs(y - end.get_y())
+            if h != maze_hash or distance > self.radius:
+                continue
+            grid = np.frombuffer(zlib.decompress(data), dtype=np.float32).reshape(shape)
+            open_tiles = grid > 0
+            if not open_tiles.any():
+                continue
+            w = 1 / (1 + distance)
+            normalized = grid / grid[open_tiles].mean()
+            blend = normalized * w if blend is None else blend + normalized * w
+            total_weight += w
+            closest_weight = max(closest_weight, w)
+            self.snapshots.move_to_end(key)
+
+        if blend is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # nearby targets are less trustworthy, so their snapshots get less weight against the uniform start
+        weight = self.weight * closest_weight
+        return np.where(maze.open_tiles, weight * blend / total_weight + (1 - weight), 0)
+
+    # Amount of cached snapshots
+    # @return size of the cache
+    def __len__(self):
+        return len(self.snapshots)
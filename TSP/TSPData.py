@@ -12,6 +12,7 @@ import re
 import traceback
 import numpy as np
 from src.AntColonyOptimization import AntColonyOptimization
+from src.Ant import BFS
 from src.Coordinate import Coordinate
 from src.Maze import Maze
 from src.PathSpecification import PathSpecification
@@ -41,13 +42,61 @@ class TSPData:
     # Calculate the routes from the product locations to each other, the start, and the end.
     # Additionally generate arrays that contain the length of all the routes.
     # @param maze
-    def calculate_routes(self, aco):
-        self.product_to_product = self.build_distance_matrix(aco)
+    # @param one_to_many find all routes from a product with a single colony run instead of one run per pair
+    # @param seed seed of the ants, the routes then do not depend on which process solves which pair (None keeps
+    # the seed of aco)
+    def calculate_routes(self, aco, one_to_many=False, seed=None):
+        maze = aco.maze
+        if seed is not None:
+            aco.set_seed(seed)
+        # a single pruned maze keeps all products, the start and the end open, so it serves every pair
+        if aco.prune_dead_ends:
+            aco.maze = maze.get_pruned(self.product_locations + [self.spec.get_start(), self.spec.get_end()])
+        # distance fields computed now are copied along with the maze to every pair solve
+        if aco.heuristic == BFS:
+            for location in self.product_locations + [self.spec.get_end()]:
+                aco.maze.get_distance_field(location)
+        if one_to_many:
+            self.product_to_product = self.build_distance_matrix_one_to_many(aco)
+        else:
+            self.product_to_product = self.build_distance_matrix(aco)
         self.start_to_product = self.build_start_to_products(aco)
         self.product_to_end = self.build_products_to_end(aco)
+        self.complete_routes(aco.maze)
         self.build_distance_lists()
+        aco.maze = maze
         return
 
+    # Replace the routes the colony did not finish, e.g. because its deadline passed or no ant of a one-to-many run
+    # reached the product, by the shortest route of the maze, so an unreached pair never gets the length of a
+    # partial route.
+    # @param maze the maze the routes were searched in
+    def complete_routes(self, maze):
+        start = self.spec.get_start()
+        end = self.spec.get_end()
+        for i, product in enumerate(self.product_locations):
+            for j, other in enumerate(self.product_locations):
+                self.product_to_product[i][j] = self.complete_route(maze, self.product_to_product[i][j], product, other)
+            self.start_to_product[i] = self.complete_route(maze, self.start_to_product[i], start, product)
+            self.product_to_end[i] = self.complete_route(maze, self.product_to_end[i], product, end)
+
+    # A finished route, or the shortest route of the maze between the same points.
+    # @param maze the maze the route was searched in
+    # @param route the route found by the colony, None when it found none
+    # @param start the start of the route
+    # @param end the end of the route
+    # @return the finished route
+    # @throws ValueError when the end cannot be reached from the start
+    @staticmethod
+    def complete_route(maze, route, start, end):
+        if route is not None and route.done:
+            return route
+        shortest = maze.get_shortest_route(start, end, maze.open_tiles)
+        if shortest is None:
+            raise ValueError("no route from " + str(start) + " to " + str(end))
+        print("no route found from " + str(start) + " to " + str(end) + ", using the shortest route of the maze")
+        return shortest
+
     # Build a list of integer distances of all the product-product routes.
     def build_distance_lists(self):
         number_of_products = len(self.product_locations)
@@ -78,6 +127,16 @@ class TSPData:
     def get_end_distances(self):
         return self.end_distances
 
+    # Length of a tour from the start, through the products in the given order, to the end.
+    # The product pick up actions are not included.
+    # @param product_order order in which the products are visited
+    # @return length of the tour
+    def get_tour_length(self, product_order):
+        total_length = self.start_distances[product_order[0]]
+        for i in range(len(product_order) - 1):
+            total_length += self.distances[product_order[i]][product_order[i + 1]]
+        return total_length + self.end_distances[product_order[len(product_order) - 1]]
+
     # Equals method
     # @param other other TSPData to check
     # @return boolean whether equal
@@ -98,13 +157,7 @@ class TSPData:
     # @param productOrder Solution of the TSP problem
     # @param filePath Path to the solution file
     def write_action_file(self, product_order, file_path):
-        total_length = self.start_distances[product_order[0]]
-        for i in range(len(product_order) - 1):
-            frm = product_order[i]
-            to = product_order[i + 1]
-            total_length += self.distances[frm][to]
-
-        total_length += self.end_distances[product_order[len(product_order) - 1]] + len(product_order)
+        total_length = self.get_tour_length(product_order) + len(product_order)
 
         string = ""
         string += str(total_length)
@@ -190,6 +243,17 @@ class TSPData:
                 print(Coordinate(i, j).__str__() + ": " + str(product_to_product[i][j].done))
         return product_to_product
 
+    # Calculate the optimal routes between all the products, with one colony run per product
+    # that finds the routes to all the other products at once.
+    # @param aco the optimization object
+    # @return Optimal routes between all products in 2d array
+    def build_distance_matrix_one_to_many(self, aco):
+        product_to_product = []
+        for i in range(len(self.product_locations)):
+            product_to_product.append(aco.find_shortest_routes(self.product_locations[i], self.product_locations))
+            print("done: " + str(i))
+        return product_to_product
+
     # Calculate optimal route between the start and all the products
     # @param maze Maze to calculate optimal routes in
     # @return Optimal route from start to products
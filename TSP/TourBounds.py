@@ -0,0 +1,146 @@
+import math
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+
+# Amount of subgradient steps used to tighten the Held-Karp bound.
+ITERATIONS = 100
+# Amount of steps without improvement before the step size is halved.
+PATIENCE = 10
+
+
+# Lower bound on the length of a tour from the start, through all products, to the end point.
+# The fixed start and end are merged into one depot node that has exactly one start edge and one end edge,
+# so every valid tour is a 1-tree in which all nodes have degree 2. Subgradient optimization on node
+# penalties (Held-Karp) pushes the minimum 1-tree towards such a tour, which gives a tight bound.
+class TourBounds:
+
+    # Constructs a bound for a TSP problem.
+    # @param tsp_data TSPData object with calculated distance lists.
+    # @param iterations amount of subgradient steps.
+    def __init__(self, tsp_data, iterations=ITERATIONS):
+        distances = np.array(tsp_data.get_distances(), dtype=float)
+        # tours may be walked in any direction, the cheapest direction is a valid bound for both
+        self.distances = np.minimum(distances, distances.T) if distances.size else distances
+        self.start_distances = np.array(tsp_data.get_start_distances(), dtype=float)
+        self.end_distances = np.array(tsp_data.get_end_distances(), dtype=float)
+        self.iterations = iterations
+        self.lower_bound = None
+
+    # Returns the lower bound, computing it on first use.
+    # @param upper_bound length of a known tour, a nearest neighbour tour is used when omitted.
+    # @return integer lower bound on the tour length (excluding the product pick up actions)
+    def get_lower_bound(self, upper_bound=None):
+        if self.lower_bound is None:
+            self.lower_bound = self.held_karp(upper_bound)
+        return self.lower_bound
+
+    # Relative distance of a tour length to the lower bound.
+    # @param length length of a tour
+    # @return the gap, 0 meaning the tour is optimal
+    def gap(self, length):
+        bound = self.get_lower_bound()
+        if bound <= 0:
+            return 0.0 if length <= 0 else math.inf
+        return (length - bound) / bound
+
+    # Check whether a tour is provably close enough to optimal.
+    # @param length length of a tour
+    # @param max_gap allowed relative gap
+    # @return whether the tour is within max_gap of the optimum
+    def within_gap(self, length, max_gap):
+        return self.gap(length) <= max_gap
+
+    # Subgradient optimization of the 1-tree bound.
+    # @param upper_bound length of a known tour
+    # @return integer lower bound
+    def held_karp(self, upper_bound=None):
+        n = len(self.start_distances)
+        if n == 0:
+            return 0
+        if upper_bound is None:
+            upper_bound = self.nearest_neighbour_length()
+
+        pi = np.zeros(n)
+        best = -math.inf
+        step = 2.0
+        stale = 0
+        for _ in range(self.iterations):
+            bound, degrees = self.one_tree(pi)
+            if bound > best + 1e-9:
+                best = bound
+                stale = 0
+            else:
+                stale += 1
+                if stale >= PATIENCE:
+                    step /= 2
+                    stale = 0
+            subgradient = degrees - 2
+            norm = np.dot(subgradient, subgradient)
+            # every node has degree 2, the 1-tree is a tour and therefore optimal
+            if norm == 0 or best >= upper_bound:
+                break
+            pi += step * (upper_bound - bound) / norm * subgradient
+
+        # all distances are integers, so the bound can be rounded up
+        return min(math.ceil(best - 1e-9), upper_bound)
+
+    # Minimum 1-tree for the given node penalties.
+    # @param pi penalty per product
+    # @return the penalized bound and the degree of every product in the tree
+    def one_tree(self, pi):
+        n = len(pi)
+        degrees = np.zeros(n, dtype=int)
+        start = self.start_distances + pi
+        end = self.end_distances + pi
+        if n == 1:
+            degrees[0] = 2
+            return start[0] + end[0] - 2 * pi.sum(), degrees
+
+        # minimum spanning tree over the products (Prim)
+        cost = self.distances + pi[:, None] + pi[None, :]
+        in_tree = np.zeros(n, dtype=bool)
+        in_tree[0] = True
+        closest = cost[0].copy()
+        parent = np.zeros(n, dtype=int)
+        total = 0.0
+        for _ in range(n - 1):
+            k = int(np.argmin(np.where(in_tree, np.inf, closest)))
+            total += closest[k]
+            degrees[k] += 1
+            degrees[parent[k]] += 1
+            in_tree[k] = True
+            closer = cost[k] < closest
+            closest = np.where(closer, cost[k], closest)
+            parent = np.where(closer, k, parent)
+
+        # depot edges: a start edge and an end edge to two different products
+        i = int(np.argmin(start))
+        j = int(np.argmin(end))
+        if i == j:
+            second_start = np.partition(start, 1)[1]
+            second_end = np.partition(end, 1)[1]
+            if second_start + end[j] <= start[i] + second_end:
+                i = int(np.argsort(start)[1])
+            else:
+                j = int(np.argsort(end)[1])
+        total += start[i] + end[j]
+        degrees[i] += 1
+        degrees[j] += 1
+        return total - 2 * pi.sum(), degrees
+
+    # Length of the greedy nearest neighbour tour, used as upper bound for the step size.
+    # @return tour length
+    def nearest_neighbour_length(self):
+        n = len(self.start_distances)
+        current = int(np.argmin(self.start_distances))
+        length = self.start_distances[current]
+        visited = np.zeros(n, dtype=bool)
+        visited[current] = True
+        for _ in range(n - 1):
+            nxt = int(np.argmin(np.where(visited, np.inf, self.distances[current])))
+            length += self.distances[current][nxt]
+            visited[nxt] = True
+            current = nxt
+        return length + self.end_distances[current]
@@ -0,0 +1,21 @@
+import importlib
+import os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+# the sources import each other as the src package, the TSP directory is that package
+sys.modules.setdefault("src", importlib.import_module("TSP"))
+
+from src.Coordinate import Coordinate
+from src.Maze import Maze
+from src.PathSpecification import PathSpecification
+
+
+# The small benchmark maze with the route from its top left to its bottom right corner.
+@pytest.fixture
+def small_maze():
+    maze = Maze.create_maze(os.path.join(ROOT, "data", "benchmark", "small maze.txt"))
+    spec = PathSpecification(Coordinate(0, 0), Coordinate(maze.get_width() - 1, maze.get_length() - 1))
+    return maze, spec
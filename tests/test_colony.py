@@ -0,0 +1,17 @@
+import src.AntColonyOptimization as colony
+from src.AntColonyOptimization import AntColonyOptimization
+
+
+def solve(maze, spec, workers):
+    aco = AntColonyOptimization(maze, 6, 4, 1000, 0.3, seed=7, workers=workers)
+    route = aco.find_shortest_route(spec)
+    return route.get_route(), [r.get_route() for r in aco.routes]
+
+
+def test_seeded_runs_do_not_depend_on_the_workers(small_maze, monkeypatch):
+    maze, spec = small_maze
+    monkeypatch.setattr(colony, "THREADING", False)
+    expected = solve(maze, spec, None)
+    monkeypatch.setattr(colony, "THREADING", True)
+    for workers in (1, 2, None):
+        assert solve(maze, spec, workers) == expected
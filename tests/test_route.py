@@ -0,0 +1,85 @@
+import pickle
+import random
+
+from src.Ant import Ant
+from src.Coordinate import Coordinate
+from src.Direction import Direction
+from src.Route import Route
+
+
+def build_route(directions):
+    route = Route(Coordinate(0, 0))
+    for direction in directions:
+        route.add(direction)
+    return route
+
+
+def random_directions(size, seed):
+    rng = random.Random(seed)
+    return [rng.choice(list(Direction)) for _ in range(size)]
+
+
+def test_hash_after_remove_last_and_truncate():
+    directions = random_directions(50, 0)
+    route = build_route(directions)
+    route.remove_last()
+    assert route == build_route(directions[:-1])
+    assert hash(route) == hash(build_route(directions[:-1]))
+    route.truncate(20)
+    assert route == build_route(directions[:20])
+    assert hash(route) == hash(build_route(directions[:20]))
+    route.add(Direction.north)
+    assert hash(route) == hash(build_route(directions[:20] + [Direction.north]))
+    route.truncate(0)
+    assert hash(route) == hash(Route(Coordinate(0, 0)))
+
+
+def test_hash_differs_for_different_routes():
+    assert hash(build_route([Direction.east, Direction.north])) != hash(build_route([Direction.north, Direction.east]))
+    assert build_route([Direction.east]) != build_route([Direction.east, Direction.east])
+
+
+def test_pickled_route_keeps_its_hash():
+    for size in (0, 1, 4, 7, 200):
+        route = build_route(random_directions(size, size))
+        route.done = True
+        copy = pickle.loads(pickle.dumps(route))
+        assert copy == route and hash(copy) == hash(route)
+        assert copy.get_route() == route.get_route() and copy.done
+        if size > 0:
+            # the prefix hashes are rebuilt once the copy changes
+            copy.remove_last()
+            route.remove_last()
+            assert copy == route and hash(copy) == hash(route)
+
+
+def test_ant_routes_hash_like_built_routes(small_maze):
+    maze, spec = small_maze
+    maze.reset()
+    for seed in range(5):
+        route = Ant(maze, spec, seed=seed).find_route()
+        assert hash(route) == hash(build_route(route.get_route()))
+
+
+# Whether the route only steps on accessible tiles and ends at the end of the path specification.
+def is_valid(maze, route, spec):
+    position = spec.get_start()
+    for direction in route.get_route():
+        position = position.add_direction(direction)
+        if not maze.in_bounds(position) or not maze.open_tiles[position.get_x(), position.get_y()]:
+            return False
+    return position == spec.get_end()
+
+
+def test_shortcut_is_valid_and_never_longer(small_maze):
+    maze, spec = small_maze
+    maze.reset()
+    optimum = maze.get_shortest_route(spec.get_start(), spec.get_end(), maze.open_tiles).size()
+    for seed in range(8):
+        route = Ant(maze, spec, seed=seed).find_route()
+        assert route.done and is_valid(maze, route, spec)
+        for radius in (1, 4, 8):
+            shortcut = route.shortcut(maze, radius)
+            assert is_valid(maze, shortcut, spec)
+            assert optimum <= shortcut.size() <= route.size()
+            assert shortcut.done and shortcut.end == route.end
@@ -0,0 +1,45 @@
+import itertools
+import random
+
+import pytest
+
+from src.Coordinate import Coordinate
+from src.PathSpecification import PathSpecification
+from src.TourBounds import TourBounds
+from src.TSPData import TSPData
+
+
+# Products at random grid points with Manhattan distances, so the distances are integers like maze distances.
+def random_tsp_data(products, seed):
+    rng = random.Random(seed)
+    points = [(rng.randrange(20), rng.randrange(20)) for _ in range(products + 2)]
+
+    def distance(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    start, end, products = points[0], points[1], points[2:]
+    tsp_data = TSPData([Coordinate(x, y) for x, y in products],
+                       PathSpecification(Coordinate(*start), Coordinate(*end)))
+    tsp_data.distances = [[distance(a, b) for b in products] for a in products]
+    tsp_data.start_distances = [distance(start, p) for p in products]
+    tsp_data.end_distances = [distance(p, end) for p in products]
+    return tsp_data
+
+
+def brute_force_length(tsp_data):
+    distances = tsp_data.get_distances()
+    best = None
+    for order in itertools.permutations(range(len(tsp_data.get_start_distances()))):
+        length = tsp_data.get_start_distances()[order[0]] + tsp_data.get_end_distances()[order[-1]]
+        length += sum(distances[a][b] for a, b in zip(order, order[1:]))
+        best = length if best is None else min(best, length)
+    return best
+
+
+@pytest.mark.parametrize("products", [1, 2, 3, 5, 7])
+@pytest.mark.parametrize("seed", range(5))
+def test_held_karp_bound_is_at_most_the_optimum(products, seed):
+    tsp_data = random_tsp_data(products, seed)
+    optimum = brute_force_length(tsp_data)
+    assert TourBounds(tsp_data).get_lower_bound() <= optimum
+    assert TourBounds(tsp_data).get_lower_bound(upper_bound=optimum) <= optimum